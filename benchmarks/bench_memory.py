@@ -0,0 +1,156 @@
+"""Peak memory of Step 1 cleaning: chunked pipeline vs. the old whole-roster path.
+
+For every --rows size a synthetic raw roster (title rows, merged store
+cells, multi-section 文案) is written once, then each mode cleans it in a
+fresh subprocess so the peaks do not influence each other:
+
+  chunked  clean_pipeline.clean_roster (the Step 1 button / workshop_cli clean)
+  whole    the previous implementation: all records, the DataFrame and a
+           regular openpyxl workbook (DataFrame.to_excel) in memory at once
+
+Reported: peak RSS, growth over the RSS after imports, and wall time. The
+chunked growth should stay roughly flat as the roster grows; what remains
+is mostly openpyxl's shared-strings table of the input file, which scales
+with the number of distinct cells.
+
+Usage:
+    python benchmarks/bench_memory.py [--rows 20000 80000] [--chunk-rows 5000]
+    python benchmarks/bench_memory.py --rows 200000       # group-wide export size
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("chunked", "whole")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    try:
+        import resource
+    except ImportError: # Windows
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KB on Linux
+
+
+def write_raw_roster(path, rows):
+    """A raw export like the group-wide one: two title rows, header, store only on the first row of a block."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["维修师介绍 (内存基准)"])
+    ws.append([])
+    ws.append(["序号", "姓名", "区域", "城市", "门店", "匠龄", "文案"])
+    for i in range(rows):
+        name = f"张{chr(0x4e00 + i % 20000)}{chr(0x4e00 + i // 20000)}"
+        text = (f"专业领域：\n深耕手机维修{i % 15 + 1}年，累计修复{i + 1000}台设备，好评率99%。\n"
+                f"技术专长：\n擅长主板级维修、进水机抢修与数据恢复，编号{i}。\n"
+                f"服务理念：\n用心对待每一台设备，让顾客放心。\n"
+                f"匠人独白：专注维修第{i % 20 + 1}年，初心不改")
+        store = f"门店{i // 10}" if i % 10 == 0 else None
+        ws.append([i + 1, name, "华东", "城市", store, f"{i % 20 + 1}年", text])
+    wb.save(path)
+
+
+def clean_whole(input_path, rules):
+    """The pre-chunking Step 1, kept here as the baseline."""
+    import pandas as pd
+
+    import data_sidecar
+    import quality_rules
+    from clean_pipeline import ChecklistWriter, checklist_path_for, cleaned_path_for
+    from roster_engine import CLEANED_COLUMNS, Roster, iter_cleaned_records, resolve_columns
+
+    roster = Roster(input_path)
+    roles = resolve_columns(roster)
+    new_data = list(iter_cleaned_records(roster, roles))
+    df_cleaned = pd.DataFrame(new_data, columns=CLEANED_COLUMNS)
+    output_path = cleaned_path_for(input_path)
+    df_cleaned.to_excel(output_path, index=False)
+    data_sidecar.write_sidecar(output_path, df_cleaned)
+    results = quality_rules.evaluate(df_cleaned, rules)
+    marks = quality_rules.rows_by_number(r for r in results if r.level != "info")
+    checklist = ChecklistWriter(checklist_path_for(input_path))
+    checklist.append((row for _, row in df_cleaned.iterrows()), 1, marks)
+    checklist.finish(results, quality_rules.blocking(results))
+    return len(df_cleaned)
+
+
+def run_child(mode, input_path, chunk_rows):
+    """Cleans input_path in this process and prints one JSON line with the measurements."""
+    # Imports are part of the baseline, not of the growth
+    for module in ("pandas", "openpyxl"):
+        importlib.import_module(module)
+    import quality_rules
+    from clean_pipeline import clean_roster
+
+    rules = quality_rules.load_rules()
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "chunked":
+        rows = clean_roster(input_path, log=lambda message: None, rules=rules, chunk_rows=chunk_rows,
+                            history=False).rows
+    else:
+        rows = clean_whole(input_path, rules)
+    seconds = time.perf_counter() - started
+    peak = peak_rss_mb()
+    print(json.dumps({"mode": mode, "rows": rows, "baseline_mb": baseline, "peak_mb": peak, "seconds": seconds}))
+    return 0
+
+
+def measure(mode, input_path, chunk_rows):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, input_path,
+                          "--chunk-rows", str(chunk_rows)],
+                         capture_output=True, text=True, encoding="utf-8", check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 80000])
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "XLSX"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return run_child(args.child[0], args.child[1], args.chunk_rows)
+
+    print(f"{'rows':>8}  {'mode':<8} {'peak RSS':>10} {'growth':>10} {'time':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            input_path = os.path.join(tmp, f"roster_{rows}.xlsx")
+            write_raw_roster(input_path, rows)
+            for mode in args.modes:
+                m = measure(mode, input_path, args.chunk_rows)
+                print(f"{m['rows']:>8}  {mode:<8} {m['peak_mb']:>8.0f}MB {m['peak_mb'] - m['baseline_mb']:>8.0f}MB "
+                      f"{m['seconds']:>7.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
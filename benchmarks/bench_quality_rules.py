@@ -0,0 +1,63 @@
+"""Benchmark for the data-quality rules on a large synthetic roster.
+
+Builds a cleaned frame with --rows rows (a few deliberately bad ones) and
+times quality_rules.evaluate with rules/default.json.
+
+Usage:
+    python benchmarks/bench_quality_rules.py [--rows 100000] [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quality_rules
+
+
+def synthetic_roster(rows):
+    import pandas as pd
+
+    names = [f"张{chr(0x4e00 + i % 20000)}{chr(0x4e00 + i // 20000)}" for i in range(rows)]
+    names[::997] = ["3年"] * len(names[::997])
+    return pd.DataFrame({
+        "姓名": names,
+        "门店": [f"门店{i % 500}" for i in range(rows)],
+        "匠龄": [f"{i % 20}+年" if i % 101 else "10 年" for i in range(rows)],
+        "匠人独白": ["用心做好每一台手机" * (1 + (i % 211 == 0) * 6) for i in range(rows)],
+        "标题1": ["专业领域"] * rows,
+        "描述1": [f"深耕维修{i % 15}年，服务5000+台。" for i in range(rows)],
+        "标题2": ["技术专长"] * rows,
+        "描述2": ["擅长主板维修。"] * rows,
+        "标题3": [""] * rows,
+        "描述3": [None] * rows,
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--rules", default=quality_rules.DEFAULT_RULES_PATH)
+    args = parser.parse_args(argv)
+
+    rules = quality_rules.load_rules(args.rules)
+    df = synthetic_roster(args.rows)
+    timings = []
+    for i in range(args.runs):
+        started = time.perf_counter()
+        results = quality_rules.evaluate(df, rules)
+        timings.append(time.perf_counter() - started)
+        print(f"run {i + 1}: {timings[-1]:.3f}s, {len(results)} rules failed")
+    for result in results:
+        print(f"  [{result.level}] {result.describe()}")
+    print(f"{args.rows} rows x {len(rules)} rules: median={statistics.median(timings):.3f}s "
+          f"({args.rows / statistics.median(timings):,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Startup benchmark for the GUI launcher.
+
+Starts `excel_cleaner_tool.py --startup-bench` several times and reports
+  first_paint: process start -> main window drawn
+  ready:       process start -> background warm-up (pandas/openpyxl/COM) done
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+
+Needs a desktop session (and tkinterdnd2); run it on the office machines.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "excel_cleaner_tool.py")
+PATTERN = re.compile(r"STARTUP first_paint=([\d.]+) ready=([\d.]+)")
+
+
+def run_once(timeout):
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, APP, "--startup-bench"], cwd=ROOT,
+                          capture_output=True, text=True, timeout=timeout)
+    wall = time.perf_counter() - started
+    match = PATTERN.search(proc.stdout)
+    if not match:
+        raise RuntimeError(f"no STARTUP line (exit {proc.returncode}):\n{proc.stdout}\n{proc.stderr}")
+    # The app measures from its first import; "process" also includes interpreter start-up and exit
+    first_paint, ready = float(match.group(1)), float(match.group(2))
+    return first_paint, ready, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args(argv)
+
+    results = []
+    for i in range(args.runs):
+        first_paint, ready, wall = run_once(args.timeout)
+        results.append((first_paint, ready, wall))
+        print(f"run {i + 1}: first_paint={first_paint:.3f}s ready={ready:.3f}s process={wall:.3f}s")
+
+    # The first run is the cold start (nothing in the OS file cache yet)
+    for label, idx in (("first_paint", 0), ("ready", 1), ("process", 2)):
+        values = [r[idx] for r in results]
+        print(f"{label:12s} cold={values[0]:.3f}s median={statistics.median(values):.3f}s "
+              f"min={min(values):.3f}s max={max(values):.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Step 1 cleaning as a chunked pipeline: raw roster -> _清洗版.xlsx + .jsonl + _数据核对单.txt.
+
+Rows are read (openpyxl read-only), parsed and written in chunks of
+CHUNK_ROWS records; every output is written append-only while the roster is
+being read, so memory depends on the chunk size rather than on the size of
+the roster. Used by the GUI (Step 1 button) and `workshop_cli.py clean`.
+"""
+import os
+import shutil
+import time
+
+import data_sidecar
+import quality_rules
+import run_history
+from job_manager import JobCancelled
+from roster_engine import Roster, XlsxRecordWriter, cleaned_columns, iter_cleaned_records, resolve_columns
+
+# Records per chunk: large enough for the vectorized rule checks, small enough
+# to keep memory flat on 200k-row group exports
+CHUNK_ROWS = 5000
+
+LEVEL_ICONS = {"error": "❌", "warning": "⚠️"}
+
+
+def cleaned_path_for(input_path):
+    return os.path.splitext(input_path)[0] + "_清洗版.xlsx"
+
+
+def checklist_path_for(input_path):
+    return os.path.splitext(input_path)[0] + "_数据核对单.txt"
+
+
+def iter_chunks(records, size=CHUNK_ROWS):
+    """Groups an iterable into lists of at most size items."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ChecklistWriter:
+    """_数据核对单.txt, written append-only.
+
+    Row entries go to a temporary file while the chunks are cleaned; finish()
+    writes the header and the rule summary (known only at the end) and
+    appends the rows after it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._body_path = path + ".rows.tmp"
+        self._body = open(self._body_path, "w", encoding="utf-8")
+
+    def append(self, records, first_row, marks):
+        """Appends the entries of one chunk; first_row is the 1-based number of records[0]."""
+        f = self._body
+        for row_no, row in enumerate(records, start=first_row):
+            name = row.get("姓名", "N/A")
+            store = row.get("门店", "N/A")
+            monologue = row.get("匠人独白", "N/A")
+            t1 = row.get("标题1", "")
+            d1 = row.get("描述1", "")[:15] + "..." if row.get("描述1") else ""
+
+            f.write(f"[{row_no}] {name} @ {store}\n")
+            f.write(f"     独白: {monologue}\n")
+            f.write(f"     T1: {t1} | D1: {d1}\n")
+            for mark in marks.get(row_no, []):
+                f.write(f"     ⚠️ {mark}\n")
+            f.write("-" * 50 + "\n")
+
+    def finish(self, results, blockers):
+        self._body.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("=== 数据核对报告 ===\n")
+            f.write("请务必检查以下信息是否与原始Excel对应。\n\n")
+
+            f.write("--- 数据检查 ---\n")
+            if not results:
+                f.write("全部规则通过。\n")
+            for result in results:
+                f.write(f"[{result.level}] {result.describe()}\n")
+            if blockers:
+                f.write("存在 error 级问题，修正前无法批量生成 PSD。\n")
+            f.write("\n")
+
+            with open(self._body_path, "r", encoding="utf-8") as body:
+                shutil.copyfileobj(body, f)
+        os.replace(tmp_path, self.path)
+        os.remove(self._body_path)
+
+    def abort(self):
+        self._body.close()
+        if os.path.exists(self._body_path):
+            os.remove(self._body_path)
+
+
+class CleanResult:
+    def __init__(self, output_path, checklist_path, rows, results):
+        self.output_path = output_path
+        self.checklist_path = checklist_path
+        self.rows = rows
+        self.results = results
+
+    @property
+    def blockers(self):
+        return quality_rules.blocking(self.results)
+
+
+def record_history(input_path, started, started_at, status, rows, stages, blockers=(), error=None, log=print):
+    """Stores a clean run in run_history; never raises."""
+    try:
+        run_history.record_run("clean", started, time.perf_counter() - started_at, status, rows, input_path,
+                               {"failed": len(blockers)}, stages=stages.to_dict(), error=error)
+    except Exception as e:
+        log(f"警告: 写入运行历史失败: {e}")
+
+
+def clean_roster(input_path, log=print, job=None, rules=None, chunk_rows=CHUNK_ROWS, history=True):
+    """Cleans a raw roster into the Step 1 outputs; returns a CleanResult.
+
+    Nothing is replaced until every row has been read: a cancelled job
+    (JobCancelled) or a failure leaves earlier outputs untouched. With
+    history the run is recorded in run_history (failed = blocking rules).
+    """
+    import pandas as pd
+
+    started, started_at = time.strftime(run_history.TIME_FORMAT), time.perf_counter()
+    stages = run_history.StageTimer()
+    rules = quality_rules.load_rules() if rules is None else rules
+    log(f"正在读取: {os.path.basename(input_path)}")
+
+    # --- Smart Header Detection (streaming reader, see roster_engine) ---
+    with stages("read"):
+        roster = Roster(input_path)
+    if roster.detected:
+        log(f"自动检测到表头在第 {roster.header_row + 1} 行")
+    else:
+        log(f"⚠️ 未检测到标准表头(姓名/门店)，尝试默认位置 (header={roster.header_row})...")
+
+    roles = resolve_columns(roster, log=log)
+    columns = cleaned_columns(roles)
+    if job and roster.estimated_rows is not None: job.set_total(roster.estimated_rows)
+
+    output_path = cleaned_path_for(input_path)
+    checklist_path = checklist_path_for(input_path)
+    checker = quality_rules.RuleChecker(rules)
+    xlsx = XlsxRecordWriter(output_path, columns)
+    checklist = ChecklistWriter(checklist_path)
+    try:
+        sidecar = data_sidecar.SidecarWriter(output_path, columns)
+    except OSError as e:
+        log(f"警告: 写入快速读取副本失败 (不影响使用): {e}")
+        sidecar = None
+
+    rows = 0
+    chunks = iter_chunks(iter_cleaned_records(roster, roles, job=job), chunk_rows)
+    try:
+        while True:
+            # Reading and parsing happen while the next chunk is pulled
+            with stages("read"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            # Rules run on a small frame per chunk; the index carries the row position
+            with stages("rules"):
+                df = pd.DataFrame(chunk, columns=columns, index=range(rows, rows + len(chunk)))
+                marks = quality_rules.rows_by_number(r for r in checker.feed(df) if r.level != "info")
+            with stages("write"):
+                xlsx.append(chunk)
+                checklist.append(chunk, rows + 1, marks)
+                if sidecar:
+                    try:
+                        sidecar.append([record.get(c, "") for c in columns] for record in chunk)
+                    except OSError as e:
+                        log(f"警告: 写入快速读取副本失败 (不影响使用): {e}")
+                        sidecar.abort()
+                        sidecar = None
+            rows += len(chunk)
+        with stages("save"):
+            xlsx.close()
+    except BaseException as e:
+        xlsx.abort()
+        checklist.abort()
+        if sidecar:
+            sidecar.abort()
+        if history:
+            status, error = ("cancelled", None) if isinstance(e, JobCancelled) else ("failed", str(e))
+            record_history(input_path, started, started_at, status, rows, stages, error=error, log=log)
+        raise
+
+    log(f"清洗完成！已保存为: {os.path.basename(output_path)} ({rows} 行)")
+    if sidecar:
+        try:
+            with stages("save"):
+                sidecar.finish()
+        except OSError as e:
+            log(f"警告: 写入快速读取副本失败 (不影响使用): {e}")
+            sidecar.abort()
+
+    # --- Data-quality rules ---
+    results = checker.results()
+    blockers = quality_rules.blocking(results)
+    for result in results:
+        log(f"{LEVEL_ICONS.get(result.level, 'ℹ️')} {result.describe()}")
+    if blockers:
+        log(f"数据检查: {len(blockers)} 条规则未通过，修正前无法批量生成。")
+
+    with stages("save"):
+        checklist.finish(results, blockers)
+    log(f"已生成核对报告: {os.path.basename(checklist_path)}")
+    if history:
+        record_history(input_path, started, started_at, "finished", rows, stages, blockers, log=log)
+    return CleanResult(output_path, checklist_path, rows, results)
@@ -0,0 +1,132 @@
+"""Fast JSON-lines copy of the cleaned Excel, written next to it by Step 1.
+
+data/xxx_清洗版.xlsx  -> human-editable hand-off (unchanged)
+data/xxx_清洗版.jsonl -> line 1: {"schema_version", "columns", "rows", "xlsx": fingerprint}
+                        then one JSON array per row, aligned to "columns"
+
+Step 2 reads the sidecar instead of the xlsx (no openpyxl parsing, no header
+detection) as long as it still describes the xlsx: the fingerprint of the
+xlsx is stored inside the sidecar, so any later edit or re-save of the xlsx
+(size or mtime change) makes the xlsx win again.
+"""
+import json
+import os
+import shutil
+
+# Bump when the layout of the sidecar changes
+SIDECAR_VERSION = 1
+
+
+def sidecar_path_for(xlsx_path):
+    return os.path.splitext(xlsx_path)[0] + ".jsonl"
+
+
+def xlsx_fingerprint(xlsx_path):
+    st = os.stat(xlsx_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class SidecarWriter:
+    """Writes the sidecar row by row while the xlsx is still being written.
+
+    Rows go to a temporary file first; finish() puts the header line on top
+    once the xlsx is saved, because only then its fingerprint is known.
+    Empty strings are stored as null, like an empty cell read back from Excel.
+    """
+
+    def __init__(self, xlsx_path, columns):
+        self.xlsx_path = xlsx_path
+        self.columns = [str(c) for c in columns]
+        self.path = sidecar_path_for(xlsx_path)
+        self.rows = 0
+        self._body_path = self.path + ".rows.tmp"
+        self._body = open(self._body_path, "w", encoding="utf-8")
+
+    def append(self, rows):
+        """Appends value sequences aligned to columns."""
+        for values in rows:
+            row = [None if v is None or v == "" or v != v else v for v in values] # NaN != NaN
+            self._body.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            self.rows += 1
+
+    def finish(self):
+        """Must be called after the xlsx is saved; returns the sidecar path."""
+        self._body.close()
+        meta = {
+            "schema_version": SIDECAR_VERSION,
+            "columns": self.columns,
+            "rows": self.rows,
+            "xlsx": xlsx_fingerprint(self.xlsx_path),
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f, open(self._body_path, "r", encoding="utf-8") as body:
+            f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+            shutil.copyfileobj(body, f)
+        os.replace(tmp_path, self.path)
+        os.remove(self._body_path)
+        return self.path
+
+    def abort(self):
+        """Drops the rows written so far (an existing sidecar is left alone)."""
+        self._body.close()
+        if os.path.exists(self._body_path):
+            os.remove(self._body_path)
+
+
+def write_sidecar(xlsx_path, df):
+    """Writes the sidecar for a freshly written xlsx from a whole DataFrame; returns its path."""
+    writer = SidecarWriter(xlsx_path, df.columns)
+    try:
+        writer.append(df.itertuples(index=False, name=None))
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+def read_meta(xlsx_path):
+    """The sidecar header if the sidecar is usable for this xlsx, else None.
+
+    Only the first line is read, so this is cheap enough for the GUI's
+    periodic status check.
+    """
+    path = sidecar_path_for(xlsx_path)
+    if not os.path.exists(path) or not os.path.exists(xlsx_path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(meta, dict) or meta.get("schema_version") != SIDECAR_VERSION:
+        return None
+    # The xlsx was edited (or replaced) after the sidecar was written: the xlsx wins
+    if meta.get("xlsx") != xlsx_fingerprint(xlsx_path):
+        return None
+    return meta
+
+
+def load_sidecar(xlsx_path):
+    """DataFrame from the sidecar, or None when the xlsx has to be read instead."""
+    meta = read_meta(xlsx_path)
+    if meta is None:
+        return None
+    import pandas as pd
+
+    rows = []
+    width = len(meta["columns"])
+    nan = float("nan")
+    try:
+        with open(sidecar_path_for(xlsx_path), "r", encoding="utf-8") as f:
+            f.readline() # meta
+            for line in f:
+                row = json.loads(line)
+                if len(row) != width:
+                    return None
+                # null -> NaN, like an empty cell from read_excel (pandas 2 would keep None as object)
+                rows.append([nan if v is None else v for v in row])
+    except (OSError, ValueError):
+        return None
+    if len(rows) != meta.get("rows"):
+        return None # Truncated file
+    return pd.DataFrame(rows, columns=meta["columns"])
@@ -0,0 +1,187 @@
+"""Stand-in for Photoshop's COM interface, to run the generator without Photoshop.
+
+Used by `render_agent.py --fake` so the remote render protocol can be
+exercised on Linux. An opened template gets its layer tree from the
+template mapping (a text layer per field, a Smart Object per image), and
+SaveAs writes a small JSON file instead of a PSD, listing what every layer
+would contain. Everything else (reading, quality gate, sharding, packaging,
+reports) is the real PsdProcessor code.
+"""
+import json
+import os
+import time
+import types
+import zlib
+
+from psd_processor import SMART_OBJECT_KIND, PsdProcessor
+
+TEXT_KIND = 2
+POINT_TEXT, PARAGRAPH_TEXT = 1, 2
+
+
+class FakeTextItem:
+    def __init__(self, paragraph=False):
+        self.Contents = ""
+        self.Kind = PARAGRAPH_TEXT if paragraph else POINT_TEXT
+        self.Size = 24.0
+        self.Width = 400.0
+        self.Height = 200.0
+
+
+class FakeLayer:
+    TypeName = "ArtLayer"
+
+    def __init__(self, name, kind=TEXT_KIND, paragraph=False):
+        self.Name = name
+        self.Kind = kind
+        self.Visible = True
+        self.Layers = []
+        self.TextItem = FakeTextItem(paragraph) if kind == TEXT_KIND else None
+        self.placed_file = None # Smart Object contents
+
+
+class FakeLayerSet:
+    TypeName = "LayerSet"
+
+    def __init__(self, name):
+        self.Name = name
+        self.Visible = True
+        self.Layers = []
+
+    def child_group(self, name):
+        for layer in self.Layers:
+            if layer.Name == name and layer.TypeName == "LayerSet":
+                return layer
+        group = FakeLayerSet(name)
+        self.Layers.append(group)
+        return group
+
+
+class FakeDocument(FakeLayerSet):
+    Resolution = 72.0
+
+    def __init__(self, app, template):
+        super().__init__(os.path.basename(template.psd_path))
+        self.app = app
+        self.template = template
+        self.ActiveLayer = None
+        for field in template.fields:
+            self._add(field.layer, FakeLayer(field.layer_name, TEXT_KIND, paragraph=bool(field.width)))
+        for image in template.images:
+            self._add(image.layer, FakeLayer(image.layer_name, SMART_OBJECT_KIND))
+
+    def _add(self, layer_path, layer):
+        parent = self
+        for group in layer_path.split("/")[:-1]:
+            parent = parent.child_group(group)
+        parent.Layers.append(layer)
+
+    def contents(self):
+        """{layer path: text or placed file} of the current state."""
+        result = {}
+
+        def walk(parent, prefix):
+            for layer in parent.Layers:
+                path = f"{prefix}{layer.Name}"
+                if layer.TypeName == "LayerSet":
+                    walk(layer, path + "/")
+                elif layer.Kind == TEXT_KIND:
+                    result[path] = layer.TextItem.Contents
+                else:
+                    result[path] = os.path.basename(layer.placed_file) if layer.Visible and layer.placed_file else None
+        walk(self, "")
+        return result
+
+    def SaveAs(self, path, options=None, as_copy=True):
+        if self.app.render_delay:
+            time.sleep(self.app.render_delay)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"fake_psd": self.template.name, "layers": self.contents()}, f, ensure_ascii=False, indent=1)
+
+    def Close(self, save_options=None):
+        self.app.documents.pop(self.template.psd_path, None)
+
+
+class FakeActionDescriptor:
+    def __init__(self):
+        self.path = None
+
+    def PutPath(self, key, path):
+        self.path = path
+
+
+class FakeApplication:
+    Version = "fake"
+
+    def __init__(self, render_delay=0.0):
+        self.render_delay = render_delay
+        self.Preferences = types.SimpleNamespace(RulerUnits=1, TypeUnits=1)
+        self.ActiveDocument = None
+        self.templates = {}
+        self.documents = {}
+
+    def register(self, templates):
+        for template in templates:
+            self.templates[os.path.normpath(template.psd_path)] = template
+
+    def Open(self, path):
+        template = self.templates.get(os.path.normpath(path))
+        if template is None:
+            raise OSError(f"模拟 Photoshop 不认识模板 {path}")
+        doc = FakeDocument(self, template)
+        self.documents[template.psd_path] = doc
+        self.ActiveDocument = doc
+        return doc
+
+    def CharIDToTypeID(self, char_id):
+        return zlib.crc32(char_id.encode("ascii"))
+
+    def StringIDToTypeID(self, string_id):
+        return zlib.crc32(string_id.encode("ascii"))
+
+    def ExecuteAction(self, event_id, descriptor=None, dialog_mode=3):
+        # Only placedLayerReplaceContents is used: place into the active layer
+        layer = self.ActiveDocument.ActiveLayer if self.ActiveDocument else None
+        if layer is not None and descriptor is not None and descriptor.path:
+            layer.placed_file = descriptor.path
+
+    def DoJavaScript(self, code, arguments=None, mode=None):
+        return "0;0,0,0" # Template style: not bold, black
+
+
+class FakePsdProcessor(PsdProcessor):
+    """PsdProcessor talking to FakeApplication instead of Photoshop over COM."""
+
+    def __init__(self, log_callback, notify_callback=None, render_delay=0.0):
+        super().__init__(log_callback, notify_callback)
+        self.fake_app = FakeApplication(render_delay)
+
+    def warm_up_photoshop(self):
+        return True
+
+    def com_initialize(self):
+        pass
+
+    def com_uninitialize(self):
+        pass
+
+    def dispatch(self, prog_id):
+        if prog_id == "Photoshop.Application":
+            return self.fake_app
+        if prog_id == "Photoshop.ActionDescriptor":
+            return FakeActionDescriptor()
+        return types.SimpleNamespace() # Save options
+
+    # The template cache, the ETA and the run history describe real runs: leave them alone
+    def capture_template_schema(self, doc, template_path):
+        return None
+
+    def record_run_timings(self, templates, row_seconds, open_seconds):
+        pass
+
+    def record_run_history(self, run_report, templates):
+        pass
+
+    def process_batch(self, excel_path, templates, output_dir, job=None, dry_run=False, layout=None):
+        self.fake_app.register(templates if isinstance(templates, list) else [templates])
+        return super().process_batch(excel_path, templates, output_dir, job=job, dry_run=dry_run, layout=layout)
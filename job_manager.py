@@ -0,0 +1,236 @@
+import collections
+import itertools
+import queue
+import threading
+import time
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when the user cancels it."""
+
+
+class JobEvent:
+    """A single notification emitted by a job (delivered on the UI thread)."""
+
+    def __init__(self, kind, job=None, message=None, level=None, title=None):
+        self.kind = kind          # started/progress/paused/resumed/finished/cancelled/failed/log/notify
+        self.job = job
+        self.message = message
+        self.level = level        # notify only: error / warning / info
+        self.title = title
+
+    def __repr__(self):
+        name = self.job.name if self.job else None
+        return f"JobEvent({self.kind!r}, job={name!r}, message={self.message!r})"
+
+
+class Job:
+    """Handle passed to a worker function.
+
+    The worker reports progress with ``set_total``/``advance`` and calls
+    ``checkpoint()`` between rows; that is where pause blocks and cancel raises.
+    """
+
+    # Rolling window used for throughput / ETA
+    RATE_WINDOW = 30
+    # Do not flood the UI queue: at most one progress event per interval
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, job_id, name, manager):
+        self.id = job_id
+        self.name = name
+        self.state = "pending"
+        self.total = 0
+        self.done = 0
+        self.error = None
+        self.result = None
+        self.started_at = None
+        self.finished_at = None
+
+        self._manager = manager
+        self._cancel_event = threading.Event()
+        self._run_event = threading.Event()
+        self._run_event.set()
+        self._samples = collections.deque(maxlen=self.RATE_WINDOW)
+        self._last_emit = 0.0
+
+    # --- Worker side ---
+    def set_total(self, total):
+        self.total = max(int(total), 0)
+        self._emit_progress(force=True)
+
+    def advance(self, step=1, message=None):
+        self.done += step
+        self._samples.append((time.monotonic(), self.done))
+        self._emit_progress(message=message, force=bool(message) or self.done >= self.total)
+
+    def checkpoint(self):
+        """Cooperative cancel/pause point; call between rows."""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        if not self._run_event.is_set():
+            self.state = "paused"
+            self._manager._post(JobEvent("paused", self))
+            # Wake up on resume OR cancel
+            while not self._run_event.wait(0.2):
+                if self._cancel_event.is_set():
+                    break
+            if self._cancel_event.is_set():
+                raise JobCancelled()
+            self.state = "running"
+            # The pause must not count against throughput
+            self._samples.clear()
+            self._manager._post(JobEvent("resumed", self))
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    # --- Controller side ---
+    def cancel(self):
+        self._cancel_event.set()
+
+    def pause(self):
+        """Requests a pause; it takes effect at the worker's next checkpoint."""
+        if self.state in ("pending", "running"):
+            self._run_event.clear()
+
+    def resume(self):
+        """Resumes a paused job, or withdraws a pause that has not taken effect yet."""
+        self._run_event.set()
+
+    @property
+    def pause_requested(self):
+        """True between pause() and the checkpoint that actually pauses."""
+        return not self._run_event.is_set() and self.state in ("pending", "running")
+
+    @property
+    def is_active(self):
+        return self.state in ("pending", "running", "paused")
+
+    # --- Metrics ---
+    @property
+    def throughput(self):
+        """Rows per second over the rolling window (None until measurable)."""
+        if len(self._samples) < 2:
+            return None
+        (t0, d0), (t1, d1) = self._samples[0], self._samples[-1]
+        if t1 <= t0:
+            return None
+        return (d1 - d0) / (t1 - t0)
+
+    @property
+    def eta(self):
+        """Estimated seconds remaining, or None."""
+        rate = self.throughput
+        if not rate or not self.total:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    @property
+    def elapsed(self):
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def _emit_progress(self, message=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_emit < self.PROGRESS_INTERVAL:
+            return
+        self._last_emit = now
+        self._manager._post(JobEvent("progress", self, message))
+
+
+class JobManager:
+    """Runs cleaning/generation jobs on worker threads and publishes events.
+
+    Events are queued by the workers and dispatched to subscribers by
+    ``poll()``, which the Tk front end drives through ``root.after`` so that
+    all callbacks run on the UI thread.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self._events = queue.Queue()
+        self._subscribers = []
+        self._ids = itertools.count(1)
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def submit(self, name, target, *args, **kwargs):
+        """Start ``target(*args, job=job, **kwargs)`` on a worker thread."""
+        job = Job(next(self._ids), name, self)
+        self.jobs[job.id] = job
+
+        def runner():
+            job.state = "running"
+            job.started_at = time.monotonic()
+            self._post(JobEvent("started", job))
+            try:
+                job.result = target(*args, job=job, **kwargs)
+                job.state = "cancelled" if job.cancelled else "finished"
+            except JobCancelled:
+                job.state = "cancelled"
+            except Exception as e:
+                job.state = "failed"
+                job.error = e
+            finally:
+                job.finished_at = time.monotonic()
+                self._post(JobEvent(job.state, job, str(job.error) if job.error else None))
+
+        thread = threading.Thread(target=runner, name=f"job-{job.id}-{name}", daemon=True)
+        thread.start()
+        return job
+
+    def log(self, message):
+        """Thread-safe log line for subscribers."""
+        self._post(JobEvent("log", None, message))
+
+    def notify(self, level, title, message):
+        """Thread-safe request to show a dialog to the user."""
+        self._post(JobEvent("notify", None, message, level=level, title=title))
+
+    def active_jobs(self, name=None):
+        return [j for j in self.jobs.values() if j.is_active and (name is None or j.name == name)]
+
+    def poll(self):
+        """Dispatch all pending events; must be called from the UI thread."""
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            for callback in list(self._subscribers):
+                callback(event)
+            if event.job and event.kind in ("finished", "cancelled", "failed"):
+                self.jobs.pop(event.job.id, None)
+
+    def attach_tk(self, root, interval_ms=100):
+        """Pump events from Tk's event loop."""
+        def pump():
+            self.poll()
+            root.after(interval_ms, pump)
+        root.after(interval_ms, pump)
+
+    def _post(self, event):
+        self._events.put(event)
+
+
+def format_duration(seconds):
+    """Human readable duration in Chinese, e.g. '1分05秒'."""
+    if seconds is None:
+        return "--"
+    seconds = int(round(seconds))
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    if h:
+        return f"{h}小时{m:02d}分"
+    if m:
+        return f"{m}分{s:02d}秒"
+    return f"{s}秒"
@@ -0,0 +1,202 @@
+"""Output folder layout (sharding) and delivery archives.
+
+output_psds/<分组>/<门店>_<姓名>.psd       shard_by = store / region / date
+output_psds/_packages/<分组>.zip          one archive per shard + SHA256SUMS.txt
+
+Rows are rendered shard by shard, so as soon as the renderer moves on, the
+finished shard is compressed in a worker thread while Photoshop keeps
+working on the next one.
+"""
+import hashlib
+import os
+import re
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from roster_engine import REGION_COLUMN
+
+SHARD_MODES = ("none", "store", "region", "date")
+SHARD_LABELS = {"none": "不分组", "store": "按门店", "region": "按区域", "date": "按日期"}
+PACKAGE_FORMATS = ("zip", "tar.gz")
+
+# Shard of rows with an empty store / region cell
+UNSORTED_SHARD = "未分组"
+PACKAGE_DIR = "_packages"
+CHECKSUM_FILE = "SHA256SUMS.txt"
+
+# PSDs are already RLE compressed; a middle level is nearly as small and much faster
+ZIP_COMPRESSLEVEL = 6
+
+
+def safe_dir_name(value):
+    value = re.sub(r'[\\/*?:"<>|]', "", str(value)).strip().rstrip(".")
+    return value or UNSORTED_SHARD
+
+
+class OutputLayout:
+    """How a run lays out its files: shard sub-directories and optional archives."""
+
+    def __init__(self, shard_by="none", package=None, package_workers=2):
+        if shard_by not in SHARD_MODES:
+            raise ValueError(f"shard_by 必须是 {SHARD_MODES} 之一")
+        if package is not None and package not in PACKAGE_FORMATS:
+            raise ValueError(f"package 必须是 {PACKAGE_FORMATS} 之一")
+        self.shard_by = shard_by
+        self.package = package
+        self.package_workers = package_workers
+        self.run_date = time.strftime("%Y-%m-%d")
+
+    @property
+    def columns(self):
+        """Extra cleaned columns needed to compute the shard."""
+        return [REGION_COLUMN] if self.shard_by == "region" else []
+
+    def shard_for(self, store, cells):
+        """Sub-directory name of a row ('' = directly in the output directory)."""
+        if self.shard_by == "store":
+            return self._shard_dir(store)
+        if self.shard_by == "region":
+            return self._shard_dir(cells.get(REGION_COLUMN, ""))
+        if self.shard_by == "date":
+            return self.run_date
+        return ""
+
+    @staticmethod
+    def _shard_dir(value):
+        name = safe_dir_name(value)
+        # A store or region literally named _packages must not land among the archives
+        # (compared case-insensitively: Windows folders are)
+        if name.casefold() == PACKAGE_DIR.casefold():
+            name += "_"
+        return name
+
+    def ordered(self, rows):
+        """Rows grouped by shard (stable, so Excel order is kept within a shard)."""
+        if self.shard_by == "none":
+            return list(rows)
+        return sorted(rows, key=lambda r: self.shard_for(r[2], r[3]))
+
+
+class _HashingWriter:
+    """Write-only file wrapper that hashes everything written through it.
+
+    It cannot seek, so zipfile switches to streaming mode (data descriptors)
+    and the checksum is ready the moment the archive is closed, without
+    reading the archive back.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._pos = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        self._pos += len(data)
+        return self._f.write(data)
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, *args):
+        raise OSError("not seekable")
+
+    def flush(self):
+        self._f.flush()
+
+
+class ArchiveCancelled(Exception):
+    """build_archive stopped because its cancel event was set."""
+
+
+def build_archive(path, files, base_dir, fmt="zip", cancel=None):
+    """Streams files into an archive; returns (sha256 hex, size in bytes).
+
+    Member names are relative to base_dir. The archive is written to a
+    temporary .part name first, so a half-written archive is never mistaken
+    for a finished one. cancel (threading.Event) is checked between members;
+    when set, the .part file is removed and ArchiveCancelled raised.
+    """
+    def members():
+        for file_path in files:
+            if cancel is not None and cancel.is_set():
+                raise ArchiveCancelled(path)
+            yield file_path, os.path.relpath(file_path, base_dir)
+
+    tmp_path = path + ".part"
+    try:
+        with open(tmp_path, "wb") as raw:
+            writer = _HashingWriter(raw)
+            if fmt == "zip":
+                with zipfile.ZipFile(writer, "w", zipfile.ZIP_DEFLATED, allowZip64=True,
+                                     compresslevel=ZIP_COMPRESSLEVEL) as zf:
+                    for file_path, arcname in members():
+                        zf.write(file_path, arcname=arcname)
+            else:
+                with tarfile.open(fileobj=writer, mode="w|gz") as tf:
+                    for file_path, arcname in members():
+                        tf.add(file_path, arcname=arcname)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return writer.sha256.hexdigest(), os.path.getsize(path)
+
+
+class ArchivePackager:
+    """Compresses finished shards in a thread pool while rendering continues."""
+
+    def __init__(self, package_dir, fmt="zip", workers=2, log=print):
+        self.package_dir = package_dir
+        self.fmt = fmt
+        self.log = log
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="package")
+        self._futures = []
+        self._cancel = threading.Event()
+
+    def submit(self, name, files, base_dir):
+        """Queues one archive <name>.<fmt> containing files (paths relative to base_dir)."""
+        if not files:
+            return
+        os.makedirs(self.package_dir, exist_ok=True)
+        path = os.path.join(self.package_dir, f"{safe_dir_name(name)}.{self.fmt}")
+        files = list(files)
+
+        def task():
+            started = time.perf_counter()
+            sha256, size = build_archive(path, files, base_dir, self.fmt, self._cancel)
+            return {"archive": path, "files": len(files), "bytes": size, "sha256": sha256,
+                    "seconds": round(time.perf_counter() - started, 3)}
+
+        self.log(f"打包: {os.path.basename(path)} ({len(files)} 个文件，后台进行)")
+        self._futures.append(self._pool.submit(task))
+
+    def wait(self):
+        """Waits for every archive, writes SHA256SUMS.txt and returns the archive list."""
+        packages = []
+        for future in self._futures:
+            try:
+                packages.append(future.result())
+            except Exception as e:
+                self.log(f"警告: 打包失败: {e}")
+        self._pool.shutdown()
+        if packages:
+            with open(os.path.join(self.package_dir, CHECKSUM_FILE), "w", encoding="utf-8") as f:
+                for package in packages:
+                    f.write(f"{package['sha256']}  {os.path.basename(package['archive'])}\n")
+        return packages
+
+    def abort(self):
+        """Drops queued archives and stops the ones being written.
+
+        Returns once every worker has stopped, so no archive of a cancelled
+        or failed run is renamed into place afterwards.
+        """
+        self._cancel.set()
+        for future in self._futures:
+            future.cancel()
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,132 @@
+"""Technician photos: lookup by name/store and a pre-resized, content-addressed cache.
+
+Source photos (often 5-10 MB phone pictures) are decoded, cropped and
+downscaled once with Pillow in a thread pool. The result is stored under the
+SHA-1 of the source bytes plus the target size, so Photoshop only ever
+places small ready-made files and re-runs skip the decode entirely.
+"""
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "cache", "photos")
+
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+# Portraits: keep the upper part of the picture when cropping (faces are rarely centred)
+CROP_CENTERING = (0.5, 0.35)
+JPEG_QUALITY = 92
+
+
+class PhotoError(Exception):
+    """A photo could not be found, read or converted."""
+
+
+def index_folder(folder):
+    """{lower-case file stem: path} for every photo in a folder (one directory listing)."""
+    if not folder or not os.path.isdir(folder):
+        return {}
+    index = {}
+    for entry in os.scandir(folder):
+        stem, ext = os.path.splitext(entry.name)
+        if entry.is_file() and ext.lower() in PHOTO_EXTENSIONS:
+            index.setdefault(stem.strip().lower(), entry.path)
+    return index
+
+
+def find_photo(name, store, cell=None, base_dir=None, index=None):
+    """Source photo of one technician, or None.
+
+    An explicit path in the image column wins (relative paths are relative to
+    the Excel file); otherwise the folder index is searched for
+    "<门店>_<姓名>", "<姓名>_<门店>" and finally "<姓名>".
+    """
+    if cell:
+        path = cell if os.path.isabs(cell) else os.path.join(base_dir or "", cell)
+        if os.path.isfile(path):
+            return os.path.normpath(path)
+    if index:
+        for stem in (f"{store}_{name}", f"{name}_{store}", name):
+            path = index.get(stem.strip().lower())
+            if path:
+                return path
+    return None
+
+
+class PhotoCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, workers=None):
+        self.cache_dir = cache_dir
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.hits = 0
+        self.misses = 0
+
+    def cache_path(self, data, size, fit):
+        digest = hashlib.sha1(data)
+        digest.update(f"|{size[0]}x{size[1]}|{fit}".encode("ascii"))
+        return os.path.join(self.cache_dir, digest.hexdigest()[:2], digest.hexdigest() + ".jpg")
+
+    def prepare_one(self, source, size, fit="cover"):
+        """Returns the cached file for source at size, converting it on a miss."""
+        try:
+            with open(source, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            raise PhotoError(f"无法读取照片: {e}")
+
+        target = self.cache_path(data, size, fit)
+        if os.path.exists(target):
+            self.hits += 1
+            return target
+        self.misses += 1
+
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            raise PhotoError("处理照片需要安装 Pillow (pip install Pillow)")
+
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img = ImageOps.exif_transpose(img) # Phone photos are often stored rotated
+                img = img.convert("RGB")
+                if fit == "contain":
+                    img = ImageOps.pad(img, size, method=Image.LANCZOS, color="white")
+                else:
+                    img = ImageOps.fit(img, size, method=Image.LANCZOS, centering=CROP_CENTERING)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # Identical photos under different names may be converted concurrently
+                tmp_path = f"{target}.{threading.get_ident()}.tmp"
+                img.save(tmp_path, "JPEG", quality=JPEG_QUALITY)
+        except Exception as e:
+            raise PhotoError(f"照片无法解码: {e}")
+        os.replace(tmp_path, target)
+        return target
+
+    def prepare(self, requests, on_done=None):
+        """Converts many (source, size, fit) requests in the worker pool.
+
+        Returns {request: cached path or PhotoError}; duplicates are converted once.
+        on_done() is called after every finished request (progress/cancel hook).
+        """
+        unique = list(dict.fromkeys(requests))
+        results = {}
+        if not unique:
+            return results
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="photo") as pool:
+            futures = {pool.submit(self.prepare_one, *request): request for request in unique}
+            try:
+                for future, request in futures.items():
+                    try:
+                        results[request] = future.result()
+                    except PhotoError as e:
+                        results[request] = e
+                    if on_done:
+                        on_done()
+            except BaseException:
+                # Cancelled from on_done: do not convert the rest
+                for future in futures:
+                    future.cancel()
+                raise
+        return results
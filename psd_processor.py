@@ -0,0 +1,1120 @@
+import re
+import os
+import json
+import time
+import template_schema
+import template_mapping
+import quality_rules
+import photo_cache
+import data_sidecar
+import output_layout
+import run_history
+from job_manager import JobCancelled
+
+# pandas and pywin32 are imported on first use: both are slow to import, and
+# pywin32 only exists on Windows (dry runs work anywhere).
+win32com = None
+pythoncom = None
+
+
+def load_com():
+    """Imports pywin32 on first use; raises ImportError outside Windows."""
+    global win32com, pythoncom
+    if pythoncom is None:
+        import win32com.client
+        import pythoncom
+    return pythoncom
+
+
+# Transient COM failures raised while Photoshop is busy (modal dialog, still rendering, ...)
+RPC_E_CALL_REJECTED = -2147418111         # 0x80010001
+RPC_E_SERVERCALL_RETRYLATER = -2147417846 # 0x8001010A
+TRANSIENT_HRESULTS = {RPC_E_CALL_REJECTED, RPC_E_SERVERCALL_RETRYLATER}
+
+COM_RETRY_ATTEMPTS = 5
+COM_RETRY_BASE_DELAY = 0.5 # seconds, doubled after every attempt
+
+# ArtLayer.Kind of Smart Objects / placed layers (text layers are 2)
+SMART_OBJECT_KIND = 17
+
+# Applies every style run of the active text layer in one DoJavaScript call.
+# The whole textKey is read and written back inside Photoshop, so font, size
+# and paragraph settings are kept; only faux bold and colour change per run.
+# base is the template's own bold/colour ("null" on the first call: it is read
+# from the layer and returned as "bold;r,g,b", for the caller to cache), used
+# for unstyled text so a previous row's styling never leaks into the next.
+TEXT_STYLE_JSX = """(function (runs, base) {
+    function s(id) { return stringIDToTypeID(id); }
+    var ref = new ActionReference();
+    ref.putEnumerated(s("layer"), s("ordinal"), s("targetEnum"));
+    var textDesc = executeActionGet(ref).getObjectValue(s("textKey"));
+    var length = textDesc.getString(s("textKey")).length;
+    var template = textDesc.getList(s("textStyleRange")).getObjectValue(0).getObjectValue(s("textStyle"));
+    if (base === null) {
+        base = {bold: template.hasKey(s("syntheticBold")) && template.getBoolean(s("syntheticBold")), color: null};
+        if (template.hasKey(s("color")) && template.getObjectType(s("color")) == s("RGBColor")) {
+            var rgb = template.getObjectValue(s("color"));
+            base.color = [rgb.getDouble(s("red")), rgb.getDouble(s("grain")), rgb.getDouble(s("blue"))];
+        }
+    }
+    function style(bold, color) {
+        var d = new ActionDescriptor();
+        d.fromStream(template.toStream());
+        d.putBoolean(s("syntheticBold"), bold);
+        if (color) {
+            var c = new ActionDescriptor();
+            c.putDouble(s("red"), color[0]);
+            c.putDouble(s("grain"), color[1]);
+            c.putDouble(s("blue"), color[2]);
+            d.putObject(s("color"), s("RGBColor"), c);
+        }
+        return d;
+    }
+    var list = new ActionList();
+    function add(from, to, bold, color) {
+        if (to <= from) return;
+        var r = new ActionDescriptor();
+        r.putInteger(s("from"), from);
+        r.putInteger(s("to"), to);
+        r.putObject(s("textStyle"), s("textStyle"), style(bold, color));
+        list.putObject(s("textStyleRange"), r);
+    }
+    var pos = 0;
+    for (var i = 0; i < runs.length; i++) {
+        var end = Math.min(runs[i][1], length);
+        add(pos, runs[i][0], base.bold, base.color);
+        add(runs[i][0], end, runs[i][2] || base.bold, runs[i][3] || base.color);
+        pos = Math.max(pos, end);
+    }
+    add(pos, length, base.bold, base.color);
+    if (list.count) { // Empty text has nothing to style
+        textDesc.putList(s("textStyleRange"), list);
+        var target = new ActionReference();
+        target.putEnumerated(s("textLayer"), s("ordinal"), s("targetEnum"));
+        var set = new ActionDescriptor();
+        set.putReference(s("null"), target);
+        set.putObject(s("to"), s("textLayer"), textDesc);
+        executeAction(s("set"), set, DialogModes.NO);
+    }
+    return (base.bold ? "1" : "0") + ";" + (base.color ? base.color.join(",") : "");
+})(%s, %s);"""
+
+
+def is_transient_com_error(exc):
+    """True for pywintypes.com_error carrying a 'Photoshop is busy' HRESULT."""
+    hresult = getattr(exc, "hresult", None)
+    if hresult is None and exc.args and isinstance(exc.args[0], int):
+        hresult = exc.args[0]
+    if hresult in TRANSIENT_HRESULTS:
+        return True
+    # Errors raised inside a method call carry the real code in excepinfo
+    excepinfo = exc.args[2] if len(exc.args) > 2 else None
+    if isinstance(excepinfo, tuple) and len(excepinfo) > 5:
+        return excepinfo[5] in TRANSIENT_HRESULTS
+    return False
+
+
+class LayerUpdateError(Exception):
+    def __init__(self, layer_name, reason):
+        super().__init__(f"{layer_name}: {reason}")
+        self.layer_name = layer_name
+        self.reason = reason
+
+
+class RowOutcome:
+    """What happened to one Excel row during a real run."""
+
+    def __init__(self, row, name, store, target_file, template=None):
+        self.row = row              # 1-based Excel data row
+        self.name = name
+        self.store = store
+        self.target_file = target_file
+        self.template = template    # template name (several per row in fan-out runs)
+        self.status = "ok"          # ok / partial / failed / skipped
+        self.failures = []          # [{"layer": ..., "reason": ...}]
+        self.retries = 0
+        self.seconds = 0.0
+        self.text_chars = 0         # longest mapped text cell (for the run history)
+        self.longest_column = None
+
+    def fail(self, layer, reason, fatal=False):
+        self.failures.append({"layer": layer, "reason": reason})
+        self.status = "failed" if fatal else ("partial" if self.status == "ok" else self.status)
+
+    def describe(self):
+        return "; ".join(f"{f['layer']}: {f['reason']}" if f["layer"] else f["reason"] for f in self.failures)
+
+    def to_dict(self):
+        return {
+            "row": self.row, "name": self.name, "store": self.store,
+            "template": self.template, "file": self.target_file, "status": self.status,
+            "failures": self.failures, "retries": self.retries,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+class RunReport:
+    """Machine-readable result of a real generation run (written as JSON)."""
+
+    def __init__(self, excel_path, templates, output_dir):
+        self.excel_path = excel_path
+        self.templates = {t.name: t.psd_path for t in templates}
+        self.output_dir = output_dir
+        self.started = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.started_at = time.perf_counter()
+        self.finished = None
+        self.cancelled = False
+        self.error = None
+        self.outcomes = []
+        self.packages = []
+        self.stages = run_history.StageTimer()
+
+    def count(self, status):
+        return sum(1 for o in self.outcomes if o.status == status)
+
+    @property
+    def saved(self):
+        return self.count("ok") + self.count("partial")
+
+    def to_dict(self):
+        return {
+            "excel": self.excel_path,
+            "templates": self.templates,
+            "output_dir": self.output_dir,
+            "started": self.started,
+            "finished": self.finished,
+            "cancelled": self.cancelled,
+            "error": self.error,
+            "summary": {s: self.count(s) for s in ("ok", "partial", "failed", "skipped")},
+            "rows": [o.to_dict() for o in self.outcomes],
+            "packages": self.packages,
+            "stages": self.stages.to_dict(),
+        }
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+class BatchIssue:
+    def __init__(self, level, message, row=None):
+        self.level = level      # "error" / "warning" / "info"
+        self.message = message
+        self.row = row          # 1-based Excel data row, None for file-level issues
+
+    def __str__(self):
+        prefix = {"error": "❌", "warning": "⚠️", "info": "ℹ️"}.get(self.level, "")
+        where = f"第 {self.row} 行: " if self.row else ""
+        return f"{prefix} {where}{self.message}"
+
+
+class DryRunReport:
+    """Result of process_batch(dry_run=True)."""
+
+    def __init__(self, excel_path, templates):
+        self.excel_path = excel_path
+        self.templates = {t.name: t.psd_path for t in templates}
+        self.issues = []
+        self.planned_files = []
+        self.row_count = 0
+        self.estimated_seconds = None
+        self.estimate_from_history = False
+
+    def add(self, level, message, row=None):
+        self.issues.append(BatchIssue(level, message, row))
+
+    @property
+    def errors(self):
+        return [i for i in self.issues if i.level == "error"]
+
+    @property
+    def warnings(self):
+        return [i for i in self.issues if i.level == "warning"]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+class PsdProcessor:
+    REQUIRED_COLS = ["姓名", "门店"]
+    PROCESSED_COLS = ["描述1", "匠人独白", "标题1"]
+
+    # Windows MAX_PATH (without the long path prefix)
+    MAX_PATH = 259
+
+    def __init__(self, log_callback, notify_callback=None):
+        self.log = log_callback
+        # notify(level, title, message) -> shows a dialog in the GUI; None when headless
+        self.notify = notify_callback or (lambda level, title, message: None)
+        self.app = None
+        # Template font sizes per layer, so "shrink" always scales from the original
+        self._base_font_sizes = {}
+        # Template bold/colour per layer once markup has been applied to it (see TEXT_STYLE_JSX)
+        self._base_text_styles = {}
+        # Data-quality rules checked before generation ("error" rules block the run)
+        self.rules_path = quality_rules.DEFAULT_RULES_PATH
+        # Pre-resized portraits (see photo_cache)
+        self.photo_cache = photo_cache.PhotoCache()
+
+    def warm_up_photoshop(self):
+        """Preloads pywin32 and checks whether Photoshop is already running, without launching it.
+
+        Runs in the startup warm-up thread. Only the module import is saved
+        for later: COM objects cannot be shared between threads, so
+        process_batch still connects on its own worker thread.
+        Returns True if Photoshop answered.
+        """
+        try:
+            com = load_com()
+        except ImportError:
+            return False
+        com.CoInitialize()
+        try:
+            app = win32com.client.GetActiveObject("Photoshop.Application")
+            app.Version # First round trip loads the type info
+            return True
+        except Exception:
+            return False # Not running: Step 1 users should not get Photoshop launched
+        finally:
+            app = None
+            com.CoUninitialize()
+
+    def com_initialize(self):
+        load_com().CoInitialize() # Required for COM in thread
+
+    def com_uninitialize(self):
+        pythoncom.CoUninitialize()
+
+    def dispatch(self, prog_id):
+        """Creates a Photoshop COM object (fake_photoshop replaces this to run without Photoshop)."""
+        return win32com.client.Dispatch(prog_id)
+
+    def connect_photoshop(self):
+        try:
+            self.app = self.dispatch("Photoshop.Application")
+            return True
+        except Exception as e:
+            self.log(f"无法连接到 Photoshop: {e}")
+            return False
+
+    def find_layer(self, parent, layer_name):
+        """Recursively find a layer by name."""
+        try:
+            # First pass: direct children match
+            for layer in parent.Layers:
+                if layer.Name == layer_name:
+                    return layer
+            
+            # Second pass: go deep into groups
+            for layer in parent.Layers:
+                if layer.TypeName == "LayerSet": # It's a group
+                    found = self.find_layer(layer, layer_name)
+                    if found:
+                        return found
+        except Exception as e:
+            # A busy Photoshop must not look like a missing layer
+            if is_transient_com_error(e):
+                raise
+            pass # Handle cases where layers might not be accessible
+        return None
+
+    def find_layer_path(self, doc, layer_path):
+        """Finds 'Group/Sub/Layer' by walking direct children; plain names are searched recursively."""
+        parts = [p for p in layer_path.split("/") if p]
+        if len(parts) == 1:
+            return self.find_layer(doc, parts[0])
+        parent = doc
+        for part in parts:
+            match = None
+            for layer in parent.Layers:
+                if layer.Name == part:
+                    match = layer
+                    break
+            if match is None:
+                return None
+            parent = match
+        return parent
+
+    def set_text_layer(self, doc, layer_name, text, width_px=None, font_scale=None, runs=()):
+        """Sets the text of a layer; raises LayerUpdateError with the reason on failure.
+
+        layer_name may also be a 'Group/Layer' path (see template_mapping).
+        runs are text_markup style runs, applied in a single call after the text.
+        """
+        layer = self.find_layer_path(doc, layer_name)
+        
+        # FIX: If we found a Group (LayerSet) instead of a Layer, try to find the layer INSIDE the group
+        # This handles the case where there is a Group named "匠龄" containing a Text Layer named "匠龄"
+        if layer and hasattr(layer, 'TypeName') and layer.TypeName == "LayerSet":
+             # Try to find the actual layer inside this group
+             # We assume the text layer inside has the SAME name, or we just look for it recursively
+             inner_layer = self.find_layer(layer, layer_name.split("/")[-1])
+             if inner_layer:
+                 layer = inner_layer
+             else:
+                 # If exact name not found inside, maybe just pick the first Text Layer inside?
+                 # Dangerous, but better than failing. Let's stick to exact name first.
+                 pass
+
+        if not layer:
+            raise LayerUpdateError(layer_name, "未找到图层")
+
+        try:
+            if hasattr(layer, 'TypeName') and layer.TypeName == "LayerSet":
+                raise LayerUpdateError(layer_name, "找到的图层仍是一个图层组，无法修改")
+            
+            if layer.Kind != 2: # 2 = Text Layer
+                raise LayerUpdateError(layer_name, "不是文本图层")
+
+            # Activate the layer first!
+            # Modifying properties like Kind/Width for layers inside groups often fails 
+            # if the layer is not the active layer.
+            doc.ActiveLayer = layer
+            text_item = layer.TextItem
+            
+            # Reverted Punctuation Hack:
+            # Relying on Photoshop's native "Adobe World-Ready Paragraph Composer" and "Kinsoku Shori"
+            # settings in the template is the correct way to handle line-start punctuation.
+            text_item.Contents = text
+            
+            if width_px: 
+                if text_item.Kind != 2:
+                    text_item.Kind = 2 
+                
+                # CRITICAL: Reverting to unit conversion logic which worked for descriptions.
+                # Calculate width in Points (1/72 inch) relative to Document DPI manually 
+                # Formula: pt = px * 72 / dpi
+                resolution = doc.Resolution
+                width_pt = width_px * 72 / resolution
+                
+                # Set calculated Width
+                text_item.Width = width_pt
+                
+                # Safe Height
+                if text_item.Height < width_pt / 4: 
+                    text_item.Height = width_pt * 2 
+
+            # "shrink" fit policy: always scale from the template's own size,
+            # because the same document is reused for every row
+            if font_scale is not None or layer_name in self._base_font_sizes:
+                base_size = self._base_font_sizes.setdefault(layer_name, float(text_item.Size))
+                text_item.Size = base_size * (font_scale or 1.0)
+
+            # New contents take the style of the old first character, so a
+            # layer that was styled once is restyled on every later row
+            if runs or layer_name in self._base_text_styles:
+                self.apply_text_styles(layer_name, runs)
+        except LayerUpdateError:
+            raise
+        except Exception as e:
+            if is_transient_com_error(e):
+                raise # Let com_retry handle it
+            raise LayerUpdateError(layer_name, f"修改出错: {e}")
+
+    def apply_text_styles(self, layer_name, runs):
+        """Applies all style runs to the active text layer with one DoJavaScript round trip."""
+        payload = [[start, end, bold, list(color) if color else None] for start, end, bold, color in runs]
+        base = self._base_text_styles.get(layer_name)
+        result = self.app.DoJavaScript(TEXT_STYLE_JSX % (json.dumps(payload), json.dumps(base)))
+        if base is None:
+            bold, _, rgb = str(result).partition(";")
+            self._base_text_styles[layer_name] = {
+                "bold": bold == "1",
+                "color": [float(v) for v in rgb.split(",")] if rgb else None,
+            }
+
+    def replace_smart_object(self, doc, layer_path, file_path):
+        """Replaces the contents of a Smart Object layer; file_path None hides the layer.
+
+        The template document is reused for every row, so a row without a
+        photo must not show the previous technician's portrait.
+        """
+        layer = self.find_layer_path(doc, layer_path)
+        if not layer:
+            raise LayerUpdateError(layer_path, "未找到照片图层")
+        try:
+            if layer.TypeName == "LayerSet" or layer.Kind != SMART_OBJECT_KIND:
+                raise LayerUpdateError(layer_path, "不是智能对象图层")
+            if not file_path:
+                layer.Visible = False
+                return
+            layer.Visible = True
+            doc.ActiveLayer = layer
+            desc = self.dispatch("Photoshop.ActionDescriptor")
+            desc.PutPath(self.app.CharIDToTypeID("null"), os.path.abspath(file_path))
+            self.app.ExecuteAction(self.app.StringIDToTypeID("placedLayerReplaceContents"), desc, 3) # 3 = DialogModes.NO
+        except LayerUpdateError:
+            raise
+        except Exception as e:
+            if is_transient_com_error(e):
+                raise # Let com_retry handle it
+            raise LayerUpdateError(layer_path, f"替换照片出错: {e}")
+
+    def com_retry(self, func, *args, what="COM 调用", outcome=None):
+        """Calls func(*args), retrying with exponential backoff while Photoshop is busy."""
+        for attempt in range(COM_RETRY_ATTEMPTS):
+            try:
+                return func(*args)
+            except Exception as e:
+                if not is_transient_com_error(e) or attempt == COM_RETRY_ATTEMPTS - 1:
+                    raise
+                delay = COM_RETRY_BASE_DELAY * (2 ** attempt)
+                if outcome is not None:
+                    outcome.retries += 1
+                self.log(f"Photoshop 忙 ({what})，{delay:.1f} 秒后重试 ({attempt + 1}/{COM_RETRY_ATTEMPTS - 1})...")
+                time.sleep(delay)
+
+    def read_batch_data(self, excel_path):
+        """Reads the cleaned Excel with the same smart header detection as Step 1.
+
+        Uses the data_sidecar copy instead when it still matches the xlsx.
+        """
+        import pandas as pd
+
+        # The JSON-lines copy written by Step 1 is much faster, as long as the xlsx was not edited since
+        df = data_sidecar.load_sidecar(excel_path)
+        if df is not None:
+            self.log(f"读取数据: {os.path.basename(data_sidecar.sidecar_path_for(excel_path))} (与 Excel 一致，跳过 Excel 解析)")
+            if "门店" in df.columns:
+                df["门店"] = df["门店"].ffill()
+            return df
+
+        self.log(f"读取 Excel 数据: {excel_path}")
+        # Read first few lines without header to find the real header row
+        df_temp = pd.read_excel(excel_path, header=None, nrows=10)
+        header_row_idx = -1
+        
+        # Look for a row containing "姓名" and "门店"
+        for idx, row in df_temp.iterrows():
+            row_str = " ".join([str(x) for x in row.values])
+            if "姓名" in row_str and "门店" in row_str:
+                header_row_idx = idx
+                break
+        
+        if header_row_idx != -1:
+            self.log(f"自动检测到表头在第 {header_row_idx + 1} 行")
+            df = pd.read_excel(excel_path, header=header_row_idx)
+        else:
+            self.log("未检测到标准表头，尝试默认设置 (header=0)...")
+            df = pd.read_excel(excel_path, header=0) # Cleaned file usually has header at 0
+
+        # Handle Merged Cells for '门店' (Forward Fill) - Safety net
+        if "门店" in df.columns:
+            df["门店"] = df["门店"].ffill()
+        return df
+
+    def missing_columns(self, df):
+        """Returns (missing_basic, missing_processed)."""
+        missing_basic = [c for c in self.REQUIRED_COLS if c not in df.columns]
+        missing_processed = [c for c in self.PROCESSED_COLS if c not in df.columns]
+        return missing_basic, missing_processed
+
+    def check_quality(self, df):
+        """Runs the data-quality rules; returns the failed quality_rules.RuleResult list."""
+        return quality_rules.evaluate(df, quality_rules.load_rules(self.rules_path))
+
+    @staticmethod
+    def cell_text(row, col_name):
+        import pandas as pd
+
+        value = row[col_name]
+        if pd.isna(value):
+            return ""
+        content = str(value).strip()
+        if content == "nan": content = ""
+        return content
+
+    @staticmethod
+    def target_filename(store, name):
+        target_filename = f"{store}_{name}.psd"
+        return re.sub(r'[\\/*?:"<>|]', "", target_filename)
+
+    def capture_template_schema(self, doc, template_path):
+        """Walks the open template once and caches its layer tree for dry runs."""
+        def walk(parent):
+            nodes = []
+            for layer in parent.Layers:
+                node = {"name": layer.Name, "type": layer.TypeName}
+                if layer.TypeName == "LayerSet":
+                    node["children"] = walk(layer)
+                else:
+                    node["kind"] = int(layer.Kind)
+                    if node["kind"] == 2: # Text Layer
+                        try:
+                            text_item = layer.TextItem
+                            node["paragraph"] = int(text_item.Kind) == 2
+                            node["font_px"] = float(text_item.Size) # TypeUnits = pixels
+                            if node["paragraph"]:
+                                # Width/Height are reported in points, see set_text_layer
+                                factor = doc.Resolution / 72
+                                node["box_px"] = [float(text_item.Width) * factor, float(text_item.Height) * factor]
+                        except Exception:
+                            pass
+                nodes.append(node)
+            return nodes
+
+        previous = template_schema.load_schema(template_path) or {}
+        schema = {
+            "template": os.path.basename(template_path),
+            "fingerprint": template_schema.template_fingerprint(template_path),
+            "resolution": float(doc.Resolution),
+            "children": walk(doc),
+            # Keep the timing history across template edits; it is only an estimate
+            "timings": previous.get("timings", {}),
+        }
+        template_schema.save_schema(template_path, schema)
+        self.log(f"已缓存模板结构: {os.path.basename(template_schema.schema_path_for(template_path))}")
+        return schema
+
+    def prepare_rows(self, df, templates, extra_columns=()):
+        """Reads every row once: [(row_no, name, store, {column: text})], None cells for skipped rows.
+
+        Only the columns used by the templates (plus extra_columns, e.g. the
+        shard column) are extracted, so fan-out runs reuse the same prepared
+        cells for every template.
+        """
+        columns = []
+        for template in templates:
+            columns.extend(c for c in template.columns if c in df.columns and c not in columns)
+        columns.extend(c for c in extra_columns if c in df.columns and c not in columns)
+        rows = []
+        for idx, row in df.iterrows():
+            name = self.cell_text(row, "姓名")
+            store = self.cell_text(row, "门店")
+            cells = {c: self.cell_text(row, c) for c in columns} if name else None
+            rows.append((idx + 1, name, store, cells))
+        return rows
+
+    @staticmethod
+    def photo_key(template, image):
+        """Key of a resolved photo in the prepared cells (never clashes with a column)."""
+        return f"@{template.name}/{image.layer}"
+
+    def resolve_photos(self, rows, templates, excel_path):
+        """Finds the source photo of every row: cells[photo_key] = (path, None) or (None, reason)."""
+        base_dir = os.path.dirname(os.path.abspath(excel_path))
+        indexes = {}
+        missing = 0
+        for template in templates:
+            for image in template.images:
+                if image.folder not in indexes:
+                    indexes[image.folder] = photo_cache.index_folder(image.folder)
+                key = self.photo_key(template, image)
+                for row_no, name, store, cells in rows:
+                    if cells is None:
+                        continue
+                    source = photo_cache.find_photo(name, store, cells.get(image.column), base_dir,
+                                                    indexes[image.folder])
+                    if source:
+                        cells[key] = (source, None)
+                    else:
+                        cells[key] = (None, "未找到照片")
+                        missing += 1
+        return missing
+
+    def prepare_photos(self, rows, templates, job=None):
+        """Converts the resolved photos into the cache (worker pool) and swaps in the cached paths."""
+        requests = []
+        for template in templates:
+            for image in template.images:
+                key = self.photo_key(template, image)
+                for row_no, name, store, cells in rows:
+                    if cells is not None and cells[key][0]:
+                        requests.append((cells[key][0], image.size, image.fit))
+        if not requests:
+            return
+
+        cache = self.photo_cache
+        cache.hits = cache.misses = 0
+        started = time.perf_counter()
+        results = cache.prepare(requests, on_done=job.checkpoint if job else None)
+        self.log(f"照片准备完成: {len(results)} 张 (缓存命中 {cache.hits}，新转换 {cache.misses})，"
+                 f"耗时 {time.perf_counter() - started:.1f} 秒")
+
+        for template in templates:
+            for image in template.images:
+                key = self.photo_key(template, image)
+                for row_no, name, store, cells in rows:
+                    if cells is None or not cells[key][0]:
+                        continue
+                    result = results[(cells[key][0], image.size, image.fit)]
+                    if isinstance(result, photo_cache.PhotoError):
+                        cells[key] = (None, str(result))
+                    else:
+                        cells[key] = (result, None)
+
+    @staticmethod
+    def template_output_dir(output_dir, template, fan_out):
+        """Fan-out runs write each template into its own sub-directory."""
+        return os.path.join(output_dir, template.name) if fan_out else output_dir
+
+    @staticmethod
+    def package_name(template, shard, fan_out):
+        """Archive name of one shard, e.g. '南京店' or 'technician_南京店' for fan-out runs."""
+        name = shard or "全部"
+        return f"{template.name}_{name}" if fan_out else name
+
+    def dry_run_batch(self, excel_path, templates, output_dir, layout=None):
+        """Runs every step of process_batch except the Photoshop COM calls."""
+        report = DryRunReport(excel_path, templates)
+        fan_out = len(templates) > 1
+        layout = layout or output_layout.OutputLayout()
+
+        # 1. Data + header detection
+        try:
+            df = self.read_batch_data(excel_path)
+        except Exception as e:
+            report.add("error", f"无法读取 Excel: {e}")
+            return report
+
+        # 2. Column checks
+        missing_basic, missing_processed = self.missing_columns(df)
+        if missing_basic:
+            report.add("error", f"Excel 缺少基础列 {missing_basic}")
+        if missing_processed:
+            report.add("error", f"Excel 缺少清洗后的数据列 {missing_processed} (是否选择了原始数据文件？)")
+        if report.errors:
+            return report
+
+        # Same rules as the Step 1 checklist; "error" rules would block the real run
+        try:
+            for result in self.check_quality(df):
+                report.add(result.level, f"数据检查 {result.describe()}")
+        except quality_rules.QualityRuleError as e:
+            report.add("error", f"质量规则配置错误: {e}")
+
+        if layout.shard_by == "region" and output_layout.REGION_COLUMN not in df.columns:
+            report.add("warning", f"按区域分组需要 '{output_layout.REGION_COLUMN}' 列 (原始表格含区域列时重新执行步骤 1 即可)，"
+                                  f"所有文件将放入 '{output_layout.UNSORTED_SHARD}'")
+        rows = self.prepare_rows(df, templates, layout.columns)
+        for row_no, name, store, cells in rows:
+            if cells is None:
+                report.add("info", "姓名为空，将被跳过", row_no)
+        # Photos are only looked up here; nothing is decoded in a dry run
+        self.resolve_photos(rows, templates, excel_path)
+
+        report.estimated_seconds = 0.0
+        report.estimate_from_history = True
+        for template in templates:
+            tag = f"[{template.title}] " if fan_out else ""
+            template_path = template.psd_path
+
+            # 3. Layer mapping against the cached template schema
+            schema = template_schema.load_schema(template_path)
+            layers = {}
+            if schema is None:
+                report.add("warning", f"{tag}没有模板结构缓存，跳过图层校验 (正式生成一次后会自动建立缓存)")
+            elif template_schema.is_stale(schema, template_path):
+                report.add("warning", f"{tag}模板文件已修改，结构缓存可能已过期 (下次正式生成时会自动刷新)")
+            for field in template.fields:
+                if field.column not in df.columns:
+                    report.add("warning", f"{tag}Excel 中没有列 '{field.column}'，图层 '{field.layer}' 将保持模板原样")
+                    continue
+                if schema is None:
+                    continue
+                layer = template_schema.resolve_layer(schema, field.layer)
+                if layer is None:
+                    report.add("error", f"{tag}模板中未找到图层 '{field.layer}' (对应列 '{field.column}')")
+                elif layer["type"] == "LayerSet":
+                    report.add("error", f"{tag}图层 '{field.layer}' 是图层组，内部没有同名文本图层")
+                elif layer.get("kind") != 2:
+                    report.add("error", f"{tag}图层 '{field.layer}' 不是文本图层")
+                else:
+                    layers[field.column] = (field, layer)
+            for image in template.images:
+                if image.column and image.column not in df.columns and not image.folder:
+                    report.add("error", f"{tag}Excel 中没有照片列 '{image.column}'")
+                if image.folder and not os.path.isdir(image.folder):
+                    report.add("warning", f"{tag}照片目录不存在: {image.folder}")
+                if schema is None:
+                    continue
+                layer = template_schema.find_layer_path(schema, image.layer)
+                if layer is None:
+                    report.add("error", f"{tag}模板中未找到照片图层 '{image.layer}'")
+                elif layer.get("kind") != SMART_OBJECT_KIND:
+                    report.add("error", f"{tag}照片图层 '{image.layer}' 不是智能对象")
+
+            # 4. Per-row checks: filenames, collisions, overflow
+            template_dir = self.template_output_dir(output_dir, template, fan_out)
+            existing = {}
+            seen = {}
+            row_count = 0
+            for row_no, name, store, cells in rows:
+                if cells is None:
+                    continue
+
+                row_count += 1
+                target_filename = self.target_filename(store, name)
+                save_dir = os.path.join(template_dir, layout.shard_for(store, cells))
+                save_path = os.path.join(save_dir, target_filename)
+                report.planned_files.append(save_path)
+                if save_dir not in existing:
+                    existing[save_dir] = set(os.listdir(save_dir)) if os.path.isdir(save_dir) else set()
+
+                if save_path in seen:
+                    report.add("error", f"{tag}输出文件名 '{target_filename}' 与第 {seen[save_path]} 行重复，后者会覆盖前者", row_no)
+                else:
+                    seen[save_path] = row_no
+                if target_filename in existing[save_dir]:
+                    report.add("warning", f"{tag}输出目录已存在 '{target_filename}'，将被覆盖", row_no)
+                if len(os.path.abspath(save_path)) > self.MAX_PATH:
+                    report.add("error", f"{tag}输出路径过长 ({len(os.path.abspath(save_path))} 字符)，Windows 无法保存", row_no)
+                for image in template.images:
+                    if not cells[self.photo_key(template, image)][0]:
+                        report.add("warning", f"{tag}{name} 没有找到照片，图层 '{image.layer_name}' 将被隐藏", row_no)
+
+                for field in template.fields:
+                    if field.column not in cells:
+                        continue
+                    content = field.apply(cells[field.column], template.colors)
+                    if content.error:
+                        report.add("warning", f"{tag}'{field.column}' 样式标记有误 ({content.error})，将按原文写入", row_no)
+
+                for col_name, (field, layer) in layers.items():
+                    capacity = template_schema.estimate_capacity(layer)
+                    if not capacity or field.fit == "truncate":
+                        continue
+                    if field.fit == "shrink":
+                        # The font can shrink down to MIN_SHRINK before the text overflows
+                        capacity = capacity / (template_mapping.MIN_SHRINK ** 2)
+                    length = template_schema.visual_length(field.apply(cells[col_name], template.colors).text)
+                    if length > capacity:
+                        report.add("warning", f"{tag}'{col_name}' 约 {length:.0f} 字，可能超出文本框 (容量约 {capacity:.0f} 字)", row_no)
+
+            # 5. Time estimate from previous real runs
+            seconds, from_history = template_schema.estimate_run_seconds(schema, row_count)
+            report.estimated_seconds += seconds
+            report.estimate_from_history = report.estimate_from_history and from_history
+            report.row_count += row_count
+            if layout.shard_by != "none":
+                shards = {os.path.dirname(p) for p in report.planned_files if p.startswith(template_dir + os.sep)}
+                report.add("info", f"{tag}输出将分为 {len(shards)} 个子目录 ({output_layout.SHARD_LABELS[layout.shard_by]})")
+        return report
+
+    def log_dry_run_report(self, report):
+        for issue in report.issues:
+            if issue.level != "info":
+                self.log(str(issue))
+        minutes = (report.estimated_seconds or 0) / 60
+        basis = "基于历史耗时" if report.estimate_from_history else "无历史数据，按默认值估算"
+        self.log(f"预检完成: 将生成 {report.row_count} 个文件，预计耗时约 {minutes:.1f} 分钟 ({basis})")
+        self.log(f"错误 {len(report.errors)} 个，警告 {len(report.warnings)} 个。")
+
+    def process_batch(self, excel_path, templates, output_dir, job=None, dry_run=False, layout=None):
+        """Generates one PSD per row and template.
+
+        templates is a template_mapping.TemplateMapping or a list of them. With
+        several templates (fan-out) every row is read and prepared once, all
+        templates are opened up front and rendered one after another (one
+        document switch per template), each into its own sub-directory.
+
+        layout (output_layout.OutputLayout) shards the files into
+        sub-directories and optionally packs every finished shard into an
+        archive in the background while the next shard is rendered.
+        """
+        if isinstance(templates, template_mapping.TemplateMapping):
+            templates = [templates]
+        fan_out = len(templates) > 1
+        layout = layout or output_layout.OutputLayout()
+
+        if dry_run:
+            report = self.dry_run_batch(excel_path, templates, output_dir, layout)
+            self.log_dry_run_report(report)
+            return report
+
+        self.com_initialize()
+        
+        docs = {}
+        count = 0
+        row_seconds = {t.name: [] for t in templates}
+        open_seconds = {}
+        run_report = RunReport(excel_path, templates, output_dir)
+        stages = run_report.stages
+        packager = None
+        try:
+            with stages("connect"):
+                connected = self.connect_photoshop()
+            if not connected:
+                return
+            
+            # --- Force Preferences ---
+            # 1 = Pixels, 2 = Points, 3 = CM
+            try:
+                self.app.Preferences.RulerUnits = 1 
+                self.app.Preferences.TypeUnits = 1
+            except:
+                pass
+
+            # --- Smart Header Detection (Same as Step 1) ---
+            with stages("read"):
+                df = self.read_batch_data(excel_path)
+            
+            # Verify columns - STRICT CHECK
+            # We must ensure the user is using the CLEANED file, which has "描述1", "匠人独白", etc.
+            missing_basic, missing_processed = self.missing_columns(df)
+            if missing_basic:
+                self.log(f"错误: Excel 缺少基础列 {missing_basic}")
+                self.notify("error", "文件错误", f"所选 Excel 缺少必要列: {missing_basic}\n请检查文件格式。")
+                return
+
+            if missing_processed:
+                self.log(f"错误: Excel 缺少清洗后的数据列 {missing_processed}")
+                self.log("提示: 您似乎选择了原始数据文件？请选择步骤1生成的 '_清洗版.xlsx' 文件。")
+                self.notify("error", "选错文件了？", 
+                    f"检测到 Excel 文件缺少 {missing_processed} 等清洗列。\n\n"
+                    "您可能选择了【原始 Excel】文件！\n"
+                    "请务必选择步骤 1 生成的【_清洗版.xlsx】文件进行生成。"
+                )
+                return
+
+            # Data-quality gate: stop before any PSD is written
+            with stages("check"):
+                blockers = quality_rules.blocking(self.check_quality(df))
+            if blockers:
+                self.log(f"错误: 数据检查未通过 ({len(blockers)} 条规则)")
+                for result in blockers:
+                    self.log(f"❌ {result.describe()}")
+                self.notify("error", "数据检查未通过",
+                    "清洗版 Excel 中存在必须修正的问题，已停止生成：\n\n"
+                    + "\n".join(r.describe() for r in blockers[:5])
+                    + "\n\n可先点击【预检】查看完整列表。"
+                )
+                return
+
+            # Read and prepare every row once, whatever the number of templates
+            with stages("prepare"):
+                rows = self.prepare_rows(df, templates, layout.columns)
+            for row_no, name, store, cells in rows:
+                if cells is None:
+                    self.log(f"跳过第 {row_no} 行: 姓名为空")
+                    outcome = RowOutcome(row_no, name, store, None)
+                    outcome.status = "skipped"
+                    run_report.outcomes.append(outcome)
+
+            # Portraits: decoded and downscaled once, before Photoshop is busy
+            with stages("photos"):
+                if self.resolve_photos(rows, templates, excel_path):
+                    self.log("警告: 部分维修师没有找到照片，对应照片图层将被隐藏 (详见生成报告)")
+                self.prepare_photos(rows, templates, job)
+
+            for template in templates:
+                template_dir = self.template_output_dir(output_dir, template, fan_out)
+                if not os.path.exists(template_dir):
+                    os.makedirs(template_dir)
+
+            # Grouped by shard, so every shard is finished (and can be packed) before the next starts
+            work_rows = layout.ordered(r for r in rows if r[3] is not None)
+            total = len(work_rows)
+            if fan_out:
+                self.log(f"开始处理 {total} 个维修师数据 × {len(templates)} 个模板...")
+            else:
+                self.log(f"开始处理 {total} 个维修师数据...")
+
+            # Open every template up front
+            for template in templates:
+                self.log(f"打开模板: {template.title} ({template.psd_path})")
+                open_started = time.perf_counter()
+                doc = self.com_retry(self.app.Open, template.psd_path, what="打开模板")
+                docs[template.name] = doc
+                
+                # Re-apply Preferences AFTER opening doc just in case
+                try:
+                    self.app.Preferences.RulerUnits = 1 
+                    self.app.Preferences.TypeUnits = 1
+                except:
+                    pass
+                
+                self.log(f"当前文档分辨率: {doc.Resolution} DPI")
+
+                # Refresh the cached layer tree used by dry runs when the PSD changed
+                schema = template_schema.load_schema(template.psd_path)
+                if schema is None or template_schema.is_stale(schema, template.psd_path):
+                    try:
+                        self.capture_template_schema(doc, template.psd_path)
+                    except Exception as e:
+                        self.log(f"警告: 缓存模板结构失败: {e}")
+                open_seconds[template.name] = time.perf_counter() - open_started
+                stages.add("open", open_seconds[template.name])
+
+            if layout.package:
+                packager = output_layout.ArchivePackager(
+                    os.path.join(output_dir, output_layout.PACKAGE_DIR), layout.package,
+                    layout.package_workers, self.log)
+
+            if job: job.set_total(total * len(templates))
+            # Grouped by template: each document is activated exactly once
+            for template in templates:
+                doc = docs[template.name]
+                if fan_out:
+                    self.com_retry(setattr, self.app, "ActiveDocument", doc, what="切换文档")
+                    self.log(f"--- 模板: {template.title} ---")
+                self._base_font_sizes = {}
+                self._base_text_styles = {}
+                template_dir = self.template_output_dir(output_dir, template, fan_out)
+                shard, shard_files = None, []
+
+                for row_no, name, store, cells in work_rows:
+                    # Cooperative pause/cancel point between rows
+                    if job: job.checkpoint()
+
+                    row_shard = layout.shard_for(store, cells)
+                    if row_shard != shard:
+                        # The previous shard is complete: pack it while Photoshop continues
+                        if packager:
+                            packager.submit(self.package_name(template, shard, fan_out), shard_files, output_dir)
+                        shard, shard_files = row_shard, []
+                        os.makedirs(os.path.join(template_dir, shard), exist_ok=True)
+
+                    row_started = time.perf_counter()
+                    target_filename = self.target_filename(store, name)
+                    save_path = os.path.join(template_dir, shard, target_filename)
+                    outcome = RowOutcome(row_no, name, store, target_filename, template.name)
+                    outcome.text_chars, outcome.longest_column = max(
+                        ((len(cells.get(f.column, "")), f.column) for f in template.fields), default=(0, None))
+                    run_report.outcomes.append(outcome)
+                    
+                    self.log(f"[{row_no}/{len(rows)}] 处理: {name} @ {store}")
+
+                    # Every row is isolated: a failure is recorded and the batch moves on
+                    try:
+                        self.render_row(doc, template, cells, save_path, outcome)
+                    except Exception as e:
+                        outcome.fail(None, f"未预期的错误: {e}", fatal=True)
+
+                    outcome.seconds = time.perf_counter() - row_started
+                    stages.add("render", outcome.seconds)
+                    if outcome.status == "failed":
+                        self.log(f"❌ 第 {row_no} 行失败: {outcome.describe()}")
+                    else:
+                        count += 1
+                        shard_files.append(save_path)
+                        row_seconds[template.name].append(outcome.seconds)
+                        if outcome.status == "partial":
+                            self.log(f"⚠️ 第 {row_no} 行部分完成: {outcome.describe()}")
+                    if job: job.advance()
+
+                if packager:
+                    packager.submit(self.package_name(template, shard, fan_out), shard_files, output_dir)
+
+            if packager:
+                self.log("等待后台打包完成...")
+                with stages("package"):
+                    run_report.packages = packager.wait()
+                for package in run_report.packages:
+                    self.log(f"📦 {os.path.basename(package['archive'])}: {package['files']} 个文件，"
+                             f"{package['bytes'] / 1024 / 1024:.1f} MB，SHA-256 {package['sha256'][:12]}…")
+                packager = None
+
+            failed = run_report.count("failed")
+            partial = run_report.count("partial")
+            self.log(f"处理完成！成功生成 {count} 个文件 (其中 {partial} 个有图层问题)，失败 {failed} 个。")
+            self.log(f"保存位置: {output_dir}")
+            message = f"PSD 批量生成完成！\n共生成 {count} 个文件。\n位置: {output_dir}"
+            if failed or partial:
+                message += f"\n\n⚠️ 失败 {failed} 个，部分完成 {partial} 个，详见生成报告。"
+            self.notify("warning" if failed else "info", "完成", message)
+
+        except JobCancelled:
+            run_report.cancelled = True
+            self.log(f"⏹ 生成任务已取消，已生成 {count} 个文件。")
+            raise
+        except Exception as e:
+            run_report.error = str(e)
+            self.log(f"批量处理出错: {e}")
+            import traceback
+            self.log(traceback.format_exc())
+        finally:
+            if packager:
+                packager.abort() # Cancelled or failed run: no partial delivery archives
+            # Structured outcome of every row, also for cancelled/aborted runs
+            if (run_report.outcomes or run_report.error) and os.path.isdir(output_dir):
+                run_report.finished = time.strftime("%Y-%m-%d %H:%M:%S")
+                report_path = os.path.join(output_dir, f"_生成报告_{time.strftime('%Y%m%d_%H%M%S')}.json")
+                try:
+                    run_report.write(report_path)
+                    self.log(f"生成报告: {report_path}")
+                except Exception as e:
+                    self.log(f"警告: 写入生成报告失败: {e}")
+            for doc in docs.values():
+                try:
+                    doc.Close(2) # 2 = ppDoNotSaveChanges
+                except:
+                    pass
+            self.record_run_timings(templates, row_seconds, open_seconds)
+            if run_report.outcomes or run_report.error:
+                self.record_run_history(run_report, templates)
+            self.com_uninitialize()
+        return run_report
+
+    def record_run_timings(self, templates, row_seconds, open_seconds):
+        """Feeds the dry-run ETA with this run's timings."""
+        for template in templates:
+            if row_seconds[template.name]:
+                try:
+                    template_schema.record_timings(template.psd_path, row_seconds[template.name],
+                                                   open_seconds.get(template.name))
+                except Exception:
+                    pass
+
+    def record_run_history(self, run_report, templates):
+        """Stores the run, every row's time and the template versions in run_history."""
+        try:
+            versions = {t.name: run_history.template_version(t) for t in templates}
+            status = "cancelled" if run_report.cancelled else ("failed" if run_report.error else "finished")
+            rows = [{
+                "row": o.row, "name": o.name, "store": o.store, "template": o.template,
+                "template_version": versions.get(o.template), "status": o.status,
+                "seconds": round(o.seconds, 3) if o.status != "skipped" else None, "retries": o.retries,
+                "text_chars": o.text_chars, "longest_column": o.longest_column,
+                "failures": o.describe() or None,
+            } for o in run_report.outcomes]
+            run_history.record_run(
+                "generate", run_report.started, time.perf_counter() - run_report.started_at, status,
+                sum(1 for o in run_report.outcomes if o.status != "skipped"), run_report.excel_path,
+                {s: run_report.count(s) for s in ("ok", "partial", "failed", "skipped")},
+                versions, run_report.stages.to_dict(), run_report.error, rows)
+        except Exception as e:
+            self.log(f"警告: 写入运行历史失败: {e}")
+
+    def render_row(self, doc, template, cells, save_path, outcome):
+        """Fills the template for one prepared row and saves a copy; problems go into outcome."""
+        for field in template.fields:
+            if field.column not in cells:
+                continue
+            content = field.apply(cells[field.column], template.colors)
+            if content.error:
+                outcome.fail(field.layer_name, f"样式标记有误 ({content.error})，已按原文写入")
+            font_scale = None
+            if field.fit == "shrink":
+                length = template_schema.visual_length(content.text)
+                font_scale = max(template_mapping.MIN_SHRINK, field.max_chars / length) if length > field.max_chars else 1.0
+            try:
+                self.com_retry(self.set_text_layer, doc, field.layer, content.text, field.width, font_scale,
+                               content.runs, what=f"图层 {field.layer_name}", outcome=outcome)
+            except LayerUpdateError as e:
+                outcome.fail(e.layer_name, e.reason)
+            except Exception as e:
+                outcome.fail(field.layer, f"Photoshop 调用失败: {e}")
+
+        for image in template.images:
+            photo, reason = cells[self.photo_key(template, image)]
+            try:
+                self.com_retry(self.replace_smart_object, doc, image.layer, photo,
+                               what=f"照片 {image.layer_name}", outcome=outcome)
+            except LayerUpdateError as e:
+                outcome.fail(e.layer_name, e.reason)
+            except Exception as e:
+                outcome.fail(image.layer, f"Photoshop 调用失败: {e}")
+            if reason:
+                outcome.fail(image.layer_name, f"{reason}，已隐藏照片图层")
+
+        # Save as PSD Copy
+        # FIX: Correct ProgID is "Photoshop.PhotoshopSaveOptions"
+        try:
+            options = self.dispatch("Photoshop.PhotoshopSaveOptions")
+            options.EmbedColorProfile = True
+            options.AlphaChannels = True
+            options.Layers = True
+            self.com_retry(doc.SaveAs, save_path, options, True, what="保存", outcome=outcome) # True = asCopy
+        except Exception as save_err:
+            outcome.fail(None, f"保存失败: {save_err}", fatal=True)
@@ -0,0 +1,134 @@
+"""Golden-output regression check for the Step 1 parser (roster_engine).
+
+parser_golden.json holds anonymised 文案 cells and the cleaned record each
+one must produce. The check runs every case twice:
+  direct: roster_engine.build_record on the cell
+  sheet:  the whole corpus written as a raw roster xlsx and read back through
+          Roster / resolve_columns / iter_cleaned_records (header detection,
+          column detection and the streaming reader included)
+and prints a field-level diff for every mismatch. It then times the parser
+on the corpus repeated --repeat times and fails if a row takes longer than
+--max-ms on average.
+
+Usage:
+    python regression/check_parser.py [--repeat 300] [--max-ms 1.0]
+    python regression/check_parser.py --update   # accept the current output as golden
+
+Runs in a few seconds without Photoshop; exit code 1 on any diff or a
+timing failure.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import roster_engine
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_golden.json")
+
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_case(case):
+    data = case["input"]
+    return roster_engine.build_record(data["name"], data["store"], data["text"], data["experience"])
+
+
+def field_diffs(expected, actual):
+    """[(field, expected, actual)] for every differing field."""
+    return [(k, expected.get(k), actual.get(k))
+            for k in roster_engine.CLEANED_COLUMNS if expected.get(k) != actual.get(k)]
+
+
+def run_sheet(corpus):
+    """Cleans the corpus as a raw roster file, like the Step 1 button does."""
+    import openpyxl
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["维修师介绍 (回归测试)"])
+    ws.append([])
+    ws.append(["序号", "姓名", "区域", "城市", "门店", "匠龄", "文案"])
+    for i, case in enumerate(corpus, start=1):
+        data = case["input"]
+        ws.append([i, data["name"], "华东", "城市", data["store"], data["experience"] or None, data["text"] or None])
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        wb.save(path)
+        roster = roster_engine.Roster(path)
+        roles = roster_engine.resolve_columns(roster)
+        return list(roster_engine.iter_cleaned_records(roster, roles))
+    finally:
+        os.remove(path)
+
+
+def check(corpus, label, actual_records):
+    failures = 0
+    if len(actual_records) != len(corpus):
+        print(f"[{label}] 期望 {len(corpus)} 条记录，实际 {len(actual_records)} 条")
+        return len(corpus)
+    for case, actual in zip(corpus, actual_records):
+        diffs = field_diffs(case["expected"], actual)
+        if diffs:
+            failures += 1
+            print(f"[{label}] {case['id']} ({case['note']})")
+            for field, expected, got in diffs:
+                print(f"    {field}: 期望 {expected!r} / 实际 {got!r}")
+    return failures
+
+
+def time_parser(corpus, repeat):
+    """Average milliseconds per record over the corpus repeated `repeat` times."""
+    inputs = [c["input"] for c in corpus] * repeat
+    started = time.perf_counter()
+    for data in inputs:
+        roster_engine.build_record(data["name"], data["store"], data["text"], data["experience"])
+    return (time.perf_counter() - started) * 1000 / len(inputs), len(inputs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--repeat", type=int, default=300, help="timing: how many times to parse the corpus")
+    parser.add_argument("--max-ms", type=float, default=1.0, help="timing: allowed average milliseconds per row")
+    parser.add_argument("--update", action="store_true", help="overwrite the expected records with the current output")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+
+    if args.update:
+        changed = 0
+        for case in corpus:
+            actual = run_case(case)
+            if field_diffs(case["expected"], actual):
+                changed += 1
+                print(f"更新: {case['id']}")
+            case["expected"] = actual
+        with open(args.corpus, "w", encoding="utf-8") as f:
+            json.dump(corpus, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"已更新 {changed} 个用例 (共 {len(corpus)} 个)，请在提交前检查 diff。")
+        return 0
+
+    failures = check(corpus, "direct", [run_case(c) for c in corpus])
+    failures += check(corpus, "sheet", run_sheet(corpus))
+
+    ms_per_row, rows = time_parser(corpus, args.repeat)
+    slow = ms_per_row > args.max_ms
+    print(f"{len(corpus)} 个用例，{failures} 处不一致；"
+          f"解析 {rows} 行平均 {ms_per_row:.3f} ms/行 (上限 {args.max_ms} ms){' ❌ 超时' if slow else ''}")
+    return 1 if failures or slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
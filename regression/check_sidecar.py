@@ -0,0 +1,90 @@
+"""Step 2 must see the same cells whether it reads the .jsonl sidecar or the xlsx.
+
+The parser corpus (parser_golden.json) plus a row with every optional cell
+empty is written the way Step 1 writes it (XlsxRecordWriter +
+SidecarWriter). It is then read back both ways through
+PsdProcessor.read_batch_data, and prepare_rows must give identical cells
+for every template. Empty cells must come out as "", never as "None" or
+"nan". The pandas version matters here (empty cells are None under
+pandas 2 and NaN under pandas 3), so run this after upgrading or
+downgrading pandas.
+
+Usage:
+    python regression/check_sidecar.py
+
+Exit code 1 on any difference.
+"""
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_sidecar
+import roster_engine
+import template_mapping
+from psd_processor import PsdProcessor
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_golden.json")
+
+
+def cleaned_records():
+    with open(CORPUS, "r", encoding="utf-8") as f:
+        records = [case["expected"] for case in json.load(f)]
+    # Only the required cells filled: every other column must stay empty
+    records.append({"姓名": "空白", "门店": "空白店"})
+    # Merged store cell: empty here, filled from the row above when read back
+    records.append({"姓名": "续行", "匠人独白": "独白"})
+    return records
+
+
+def read_cells(xlsx_path, templates, via_sidecar):
+    tool = PsdProcessor(lambda message: None)
+    if not via_sidecar:
+        os.replace(data_sidecar.sidecar_path_for(xlsx_path), xlsx_path + ".off")
+    try:
+        df = tool.read_batch_data(xlsx_path)
+    finally:
+        if not via_sidecar:
+            os.replace(xlsx_path + ".off", data_sidecar.sidecar_path_for(xlsx_path))
+    return tool.prepare_rows(df, templates)
+
+
+def main():
+    templates = [template_mapping.load_template(name) for name in template_mapping.list_templates()]
+    records = cleaned_records()
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, "check_清洗版.xlsx")
+        xlsx = roster_engine.XlsxRecordWriter(xlsx_path)
+        sidecar = data_sidecar.SidecarWriter(xlsx_path, roster_engine.CLEANED_COLUMNS)
+        xlsx.append(records)
+        sidecar.append([record.get(c, "") for c in roster_engine.CLEANED_COLUMNS] for record in records)
+        xlsx.close()
+        sidecar.finish()
+        if data_sidecar.read_meta(xlsx_path) is None:
+            print("❌ 快速读取副本未被识别")
+            return 1
+
+        from_sidecar = read_cells(xlsx_path, templates, via_sidecar=True)
+        from_xlsx = read_cells(xlsx_path, templates, via_sidecar=False)
+
+    failures = 0
+    for a, b in zip(from_sidecar, from_xlsx):
+        if a != b:
+            failures += 1
+            print(f"❌ 第 {a[0]} 行不一致:\n  .jsonl: {a}\n  .xlsx:  {b}")
+        for value in [a[1], a[2]] + list((a[3] or {}).values()):
+            if value in ("None", "nan"):
+                failures += 1
+                print(f"❌ 第 {a[0]} 行空单元格被读成了 {value!r}")
+    if len(from_sidecar) != len(from_xlsx):
+        failures += 1
+        print(f"❌ 行数不一致: .jsonl {len(from_sidecar)} 行，.xlsx {len(from_xlsx)} 行")
+    print(f"{len(from_xlsx)} 行 × {len(templates)} 个模板，{failures} 处不一致")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
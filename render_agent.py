@@ -0,0 +1,549 @@
+"""Render agent: runs next to Photoshop and renders jobs submitted over HTTP.
+
+Editors clean data on their own machines (any OS) and submit the cleaned
+rows with `workshop_cli.py render --agent http://<host>:8765`; this agent,
+on the Windows box with Photoshop, queues the jobs and renders them one at a
+time with the normal PsdProcessor, then serves the results.
+
+Protocol (JSON over HTTP/1.1 keep-alive, see render_client):
+    GET    /health                       agent info, templates, queue length
+    POST   /jobs                         {job_id?, templates, columns, options, total_rows}
+    POST   /jobs/<id>/rows               {seq, rows: [[...], ...], final}   rows in batches
+    GET    /jobs/<id>?log_from=N         state, progress, new log lines, report + artifacts when done
+    GET    /jobs/<id>/artifacts/<path>   streams one output file
+    POST   /jobs/<id>/cancel
+    DELETE /jobs/<id>                    drops the job and its files
+With --token every request must carry it in the X-Render-Token header.
+
+Usage:
+    python render_agent.py [--host 0.0.0.0] [--port 8765] [--token SECRET]
+    python render_agent.py --fake       # no Photoshop: writes JSON stand-ins (see fake_photoshop)
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import data_sidecar
+import output_layout
+import template_mapping
+from job_manager import JobCancelled
+from roster_engine import XlsxRecordWriter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORK_DIR = os.path.join(BASE_DIR, "render_jobs")
+DEFAULT_PORT = 8765
+PROTOCOL_VERSION = 1
+TOKEN_HEADER = "X-Render-Token"
+
+# Largest accepted request body (one batch of rows)
+MAX_BODY_BYTES = 32 * 1024 * 1024
+STREAM_CHUNK = 256 * 1024
+# Finished jobs kept for download before the oldest are dropped
+KEEP_FINISHED_JOBS = 20
+# An upload with no new batch for this long is abandoned (client gone) and dropped
+UPLOAD_TIMEOUT_SECONDS = 15 * 60
+# How often the idle worker looks for abandoned uploads
+PRUNE_INTERVAL_SECONDS = 60
+
+JOB_ID_RE = re.compile(r"[A-Za-z0-9_-]{8,64}")
+INPUT_NAME = "input_清洗版.xlsx"
+DONE_STATES = ("finished", "failed", "cancelled")
+
+
+class AgentError(Exception):
+    """A request the agent refuses; answered with status and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AgentJob:
+    """One submitted run.
+
+    Also the job handle given to process_batch (set_total / advance /
+    checkpoint, like job_manager.Job), so progress and cancellation work
+    exactly as in the GUI.
+    """
+
+    def __init__(self, job_id, templates, columns, options, total_rows, job_dir):
+        self.id = job_id
+        self.templates = templates
+        self.columns = columns
+        self.options = options
+        self.total_rows = total_rows
+        self.job_dir = job_dir
+        self.input_path = os.path.join(job_dir, INPUT_NAME)
+        self.output_dir = os.path.join(job_dir, "output")
+        self.state = "receiving"
+        self.received = 0
+        self.next_seq = 0
+        self.total = 0
+        self.done = 0
+        self.error = None
+        self.report = None
+        self.artifacts = []
+        self.created = time.time()
+        self.last_batch = self.created
+        self.finished = None
+        self.lock = threading.Lock()
+        self._log = []
+        self._cancel = threading.Event()
+        os.makedirs(job_dir, exist_ok=True)
+        self._xlsx = XlsxRecordWriter(self.input_path, columns)
+        self._sidecar = data_sidecar.SidecarWriter(self.input_path, columns)
+
+    # --- process_batch job handle ---
+    def set_total(self, total):
+        self.total = max(int(total), 0)
+
+    def advance(self, step=1, message=None):
+        self.done += step
+
+    def checkpoint(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def log(self, message):
+        with self.lock:
+            self._log.append(str(message))
+
+    # --- Upload ---
+    def add_rows(self, seq, rows, final):
+        """Appends one batch; batches resent after a dropped connection are ignored."""
+        with self.lock:
+            if self.state == "cancelled":
+                raise AgentError(409, self.error or "任务已取消")
+            if self.state != "receiving" or seq < self.next_seq:
+                return False # Duplicate
+            if seq > self.next_seq:
+                raise AgentError(409, f"批次顺序错误: 期望 {self.next_seq}，收到 {seq}")
+            width = len(self.columns)
+            if any(not isinstance(row, list) or len(row) != width for row in rows):
+                raise AgentError(400, f"每行必须是 {width} 个值的数组")
+            self._xlsx.append(dict(zip(self.columns, row)) for row in rows)
+            self._sidecar.append(rows)
+            self.received += len(rows)
+            self.next_seq += 1
+            self.last_batch = time.time()
+            if final:
+                # The sidecar lets process_batch skip parsing the xlsx
+                self._xlsx.close()
+                self._sidecar.finish()
+                self.state = "queued"
+            return True
+
+    def discard_upload(self):
+        if self.state == "receiving":
+            self._xlsx.abort()
+            self._sidecar.abort()
+
+    def expire_upload(self, deadline):
+        """Cancels the job if it is still receiving and its last batch came before deadline."""
+        with self.lock:
+            if self.state != "receiving" or self.last_batch >= deadline:
+                return False
+            self._cancel.set()
+            self.discard_upload()
+            self.state = "cancelled"
+            self.error = "上传中断: 长时间未收到新的数据批次"
+            self.finished = time.time()
+            return True
+
+    # --- Controller side ---
+    def cancel(self):
+        self._cancel.set()
+        with self.lock:
+            if self.state in ("receiving", "queued"):
+                self.discard_upload()
+                self.state = "cancelled"
+                self.finished = time.time()
+
+    def status(self, log_from=0, queue_position=None):
+        with self.lock:
+            data = {
+                "job_id": self.id,
+                "state": self.state,
+                "templates": [t.name for t in self.templates],
+                "received": self.received,
+                "total": self.total,
+                "done": self.done,
+                "log": self._log[log_from:],
+                "log_next": len(self._log),
+                "error": self.error,
+            }
+        if queue_position is not None:
+            data["queue_position"] = queue_position
+        if self.state in DONE_STATES:
+            data["report"] = self.report
+            data["artifacts"] = self.artifacts
+        return data
+
+
+class RenderAgent:
+    """Job registry plus the single render worker (Photoshop renders one job at a time)."""
+
+    def __init__(self, work_dir=DEFAULT_WORK_DIR, processor_factory=None, token=None, fake=False,
+                 templates_dir=template_mapping.TEMPLATES_DIR, log=print, upload_timeout=UPLOAD_TIMEOUT_SECONDS):
+        self.work_dir = work_dir
+        self.upload_timeout = upload_timeout
+        self.token = token
+        self.fake = fake
+        self.templates_dir = templates_dir
+        self.log = log
+        if processor_factory is None:
+            from psd_processor import PsdProcessor
+            processor_factory = PsdProcessor
+        self.processor_factory = processor_factory
+        self.jobs = {}
+        self.pending = [] # queued job ids, in order
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._work, name="render-worker", daemon=True)
+        self._worker.start()
+
+    def health(self):
+        with self._lock:
+            running = [j.id for j in self.jobs.values() if j.state == "running"]
+            return {
+                "agent": "render_agent",
+                "protocol": PROTOCOL_VERSION,
+                "fake": self.fake,
+                "templates": sorted(template_mapping.list_templates(self.templates_dir)),
+                "queued": len(self.pending),
+                "running": running[0] if running else None,
+            }
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise AgentError(404, f"任务不存在: {job_id}")
+        return job
+
+    def create_job(self, payload):
+        job_id = payload.get("job_id") or uuid.uuid4().hex
+        if not isinstance(job_id, str) or not JOB_ID_RE.fullmatch(job_id):
+            raise AgentError(400, "job_id 只能包含字母、数字、_ 和 -")
+        names = payload.get("templates")
+        columns = payload.get("columns")
+        options = payload.get("options") or {}
+        if not isinstance(names, list) or not names or not all(isinstance(n, str) for n in names):
+            raise AgentError(400, "templates 必须是模板名列表")
+        if not isinstance(columns, list) or not columns or not all(isinstance(c, str) for c in columns):
+            raise AgentError(400, "columns 必须是列名列表")
+
+        with self._lock:
+            if job_id in self.jobs:
+                return self.jobs[job_id] # Resent after a dropped connection
+
+        try:
+            templates = [template_mapping.load_template(name, self.templates_dir) for name in names]
+        except template_mapping.TemplateConfigError as e:
+            raise AgentError(400, str(e))
+        if not self.fake:
+            missing = [t.psd_path for t in templates if not os.path.exists(t.psd_path)]
+            if missing:
+                raise AgentError(400, f"渲染节点上未找到模板文件: {missing}")
+        try:
+            output_layout.OutputLayout(options.get("shard_by", "none"), options.get("package"))
+        except ValueError as e:
+            raise AgentError(400, str(e))
+
+        job = AgentJob(job_id, templates, columns, options, payload.get("total_rows"),
+                       os.path.join(self.work_dir, job_id))
+        with self._lock:
+            self.jobs[job_id] = job
+        self.prune()
+        self.log(f"[{job_id}] 新任务: 模板 {names}，{payload.get('total_rows')} 行")
+        return job
+
+    def add_rows(self, job_id, payload):
+        job = self.get(job_id)
+        rows = payload.get("rows")
+        seq = payload.get("seq")
+        if not isinstance(rows, list) or not isinstance(seq, int):
+            raise AgentError(400, "需要 seq 和 rows")
+        accepted = job.add_rows(seq, rows, bool(payload.get("final")))
+        if accepted and job.state == "queued":
+            with self._lock:
+                self.pending.append(job.id)
+            self._queue.put(job)
+            self.log(f"[{job.id}] 已接收 {job.received} 行，排队中")
+        return {"job_id": job.id, "received": job.received, "state": job.state}
+
+    def status(self, job_id, log_from=0):
+        job = self.get(job_id)
+        with self._lock:
+            position = self.pending.index(job_id) + 1 if job_id in self.pending else None
+        return job.status(log_from, position)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        job.cancel()
+        with self._lock:
+            if job_id in self.pending and job.state == "cancelled":
+                self.pending.remove(job_id)
+        self.log(f"[{job_id}] 已请求取消")
+        return {"job_id": job_id, "state": job.state}
+
+    def delete(self, job_id):
+        job = self.get(job_id)
+        if job.state not in DONE_STATES:
+            job.cancel()
+            if job.state == "running":
+                raise AgentError(409, "任务正在渲染，已请求取消，请稍后再删除")
+        with self._lock:
+            self.jobs.pop(job_id, None)
+        shutil.rmtree(job.job_dir, ignore_errors=True)
+        return {"job_id": job_id, "deleted": True}
+
+    def prune(self, keep=KEEP_FINISHED_JOBS):
+        """Drops abandoned uploads, and the oldest finished jobs beyond keep, with their files."""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        deadline = time.time() - self.upload_timeout
+        expired = [j for j in jobs if j.expire_upload(deadline)]
+        with self._lock:
+            done = sorted((j for j in self.jobs.values() if j.state in DONE_STATES and j not in expired),
+                          key=lambda j: j.finished or 0)
+            stale = expired + done[:max(len(done) - keep, 0)]
+            for job in stale:
+                self.jobs.pop(job.id, None)
+        for job in expired:
+            self.log(f"[{job.id}] {job.error}，已删除 (收到 {job.received} 行)")
+        for job in stale:
+            shutil.rmtree(job.job_dir, ignore_errors=True)
+
+    def artifact_path(self, job_id, rel_path):
+        job = self.get(job_id)
+        # Only files listed as artifacts can be fetched (no path tricks)
+        if not any(a["path"] == rel_path for a in job.artifacts):
+            raise AgentError(404, f"没有这个输出文件: {rel_path}")
+        return os.path.join(job.output_dir, *rel_path.split("/"))
+
+    # --- Worker ---
+    def _work(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=PRUNE_INTERVAL_SECONDS)
+            except queue.Empty:
+                self._prune_safely()
+                continue
+            with self._lock:
+                if job.id in self.pending:
+                    self.pending.remove(job.id)
+            if job.state != "queued":
+                continue # Cancelled while waiting
+            try:
+                self._run(job)
+            except Exception as e: # Never let one job kill the worker
+                job.state, job.error = "failed", str(e)
+            job.finished = time.time()
+            self.log(f"[{job.id}] {job.state}" + (f": {job.error}" if job.error else ""))
+            self._prune_safely() # Uploads may have been abandoned during a long render
+
+    def _prune_safely(self):
+        try:
+            self.prune()
+        except Exception as e: # Never let housekeeping kill the worker
+            self.log(f"清理任务失败: {e}")
+
+    def _run(self, job):
+        job.state = "running"
+        self.log(f"[{job.id}] 开始渲染 {job.received} 行")
+        processor = self.processor_factory(job.log, lambda level, title, message: job.log(f"[{title}] {message}"))
+        layout = output_layout.OutputLayout(job.options.get("shard_by", "none"), job.options.get("package"))
+        os.makedirs(job.output_dir, exist_ok=True)
+        try:
+            report = processor.process_batch(job.input_path, job.templates, job.output_dir, job=job, layout=layout)
+        except JobCancelled:
+            job.state = "cancelled"
+            report = None
+        if report is not None:
+            job.report = report.to_dict()
+        job.artifacts = self.list_artifacts(job.output_dir)
+        if job.state == "cancelled":
+            return
+        if report is None:
+            job.state, job.error = "failed", "生成未开始 (数据检查未通过或无法连接 Photoshop)，详见日志"
+        elif report.error:
+            job.state, job.error = "failed", report.error
+        else:
+            job.state = "finished"
+
+    @staticmethod
+    def list_artifacts(output_dir):
+        """Every file under output_dir: [{path (with /), bytes, sha256}]."""
+        artifacts = []
+        for root, _, files in os.walk(output_dir):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, output_dir).replace(os.sep, "/")
+                artifacts.append({"path": rel_path, "bytes": os.path.getsize(path), "sha256": file_sha256(path)})
+        return sorted(artifacts, key=lambda a: a["path"])
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive: clients reuse pooled connections
+    server_version = "RenderAgent"
+    agent = None # Set by make_server
+
+    ROUTES = [
+        ("GET", re.compile(r"/health"), "health"),
+        ("POST", re.compile(r"/jobs"), "create"),
+        ("GET", re.compile(r"/jobs/([^/]+)"), "status"),
+        ("DELETE", re.compile(r"/jobs/([^/]+)"), "delete"),
+        ("POST", re.compile(r"/jobs/([^/]+)/rows"), "rows"),
+        ("POST", re.compile(r"/jobs/([^/]+)/cancel"), "cancel"),
+        ("GET", re.compile(r"/jobs/([^/]+)/artifacts/(.+)"), "artifact"),
+    ]
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        pass # Job events are logged by the agent instead of every request
+
+    def dispatch(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        try:
+            # The body is always read, so the connection stays usable after an error
+            body = self.read_body()
+            if self.agent.token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), self.agent.token):
+                raise AgentError(401, f"缺少或错误的 {TOKEN_HEADER}")
+            for route_method, pattern, action in self.ROUTES:
+                match = pattern.fullmatch(url.path)
+                if match and route_method == method:
+                    args = [urllib.parse.unquote(a) for a in match.groups()]
+                    return getattr(self, f"handle_{action}")(*args, body=body, query=urllib.parse.parse_qs(url.query))
+            raise AgentError(404, f"未知的请求 {method} {url.path}")
+        except AgentError as e:
+            self.send_json({"error": e.message}, e.status)
+        except Exception as e:
+            self.send_json({"error": f"渲染节点内部错误: {e}"}, 500)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise AgentError(413, f"请求过大 ({length} 字节)，请减小每批行数")
+        if not length:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError as e:
+            raise AgentError(400, f"请求不是合法的 JSON: {e}")
+        if not isinstance(data, dict):
+            raise AgentError(400, "请求体必须是 JSON 对象")
+        return data
+
+    def send_json(self, data, status=200):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # --- Actions ---
+    def handle_health(self, body, query):
+        self.send_json(self.agent.health())
+
+    def handle_create(self, body, query):
+        job = self.agent.create_job(body)
+        self.send_json({"job_id": job.id, "state": job.state, "next_seq": job.next_seq}, 201)
+
+    def handle_rows(self, job_id, body, query):
+        self.send_json(self.agent.add_rows(job_id, body))
+
+    def handle_status(self, job_id, body, query):
+        value = query.get("log_from", ["0"])[0] or "0"
+        if not value.isdecimal():
+            raise AgentError(400, f"log_from 必须是非负整数: {value!r}")
+        self.send_json(self.agent.status(job_id, int(value)))
+
+    def handle_cancel(self, job_id, body, query):
+        self.send_json(self.agent.cancel(job_id))
+
+    def handle_delete(self, job_id, body, query):
+        self.send_json(self.agent.delete(job_id))
+
+    def handle_artifact(self, job_id, rel_path, body, query):
+        path = self.agent.artifact_path(job_id, rel_path)
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        # Streamed in chunks: archives and PSDs can be hundreds of MB
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, STREAM_CHUNK)
+
+
+def make_server(agent, host="127.0.0.1", port=DEFAULT_PORT):
+    handler = type("BoundAgentRequestHandler", (AgentRequestHandler,), {"agent": agent})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址；局域网内使用请设为 0.0.0.0 并配合 --token")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", default=os.environ.get("RENDER_AGENT_TOKEN"), help="访问令牌 (也可用环境变量 RENDER_AGENT_TOKEN)")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="任务数据与输出目录")
+    parser.add_argument("--fake", action="store_true", help="不调用 Photoshop，输出 JSON 模拟文件 (用于测试)")
+    parser.add_argument("--fake-delay", type=float, default=0.0, help="模拟模式下每个文件的渲染耗时 (秒)")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        from fake_photoshop import FakePsdProcessor
+
+        def factory(log, notify):
+            return FakePsdProcessor(log, notify, render_delay=args.fake_delay)
+    else:
+        factory = None
+    agent = RenderAgent(args.work_dir, factory, token=args.token, fake=args.fake)
+    server = make_server(agent, args.host, args.port)
+    mode = "模拟模式 (不调用 Photoshop)" if args.fake else "Photoshop"
+    print(f"渲染节点已启动: http://{args.host}:{server.server_port} [{mode}]，任务目录 {args.work_dir}")
+    if args.host not in ("127.0.0.1", "localhost") and not args.token:
+        print("⚠️ 未设置 --token，局域网内任何人都可以提交任务。")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""Client for render_agent: submits cleaned rows to a remote Photoshop host.
+
+Used by `workshop_cli.py render`. Rows are sent in batches over a small pool
+of keep-alive connections, progress and log lines are polled back, and the
+results are streamed into the local output folder with their SHA-256
+checked against the agent's listing.
+"""
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from job_manager import JobCancelled
+from render_agent import PROTOCOL_VERSION, STREAM_CHUNK, TOKEN_HEADER
+
+BATCH_ROWS = 500
+POLL_SECONDS = 1.0
+DOWNLOAD_WORKERS = 4
+
+
+class RemoteRenderError(Exception):
+    """The agent is unreachable or refused a request."""
+
+
+def local_artifact_path(output_dir, rel_path):
+    """Where an agent-supplied artifact path goes under output_dir.
+
+    The path comes from the network: absolute paths, drive letters, empty /
+    '.' / '..' components and anything resolving outside output_dir are
+    refused with RemoteRenderError.
+    """
+    parts = str(rel_path).replace("\\", "/").split("/")
+    if any(part in ("", ".", "..") or ":" in part for part in parts):
+        raise RemoteRenderError(f"渲染节点返回了不安全的文件路径: {rel_path!r}")
+    root = os.path.abspath(output_dir)
+    path = os.path.normpath(os.path.join(root, *parts))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise RemoteRenderError(f"渲染节点返回了不安全的文件路径: {rel_path!r}")
+    return path
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to one agent, shared between threads."""
+
+    def __init__(self, base_url, size=DOWNLOAD_WORKERS, timeout=60, token=None):
+        url = urllib.parse.urlsplit(base_url if "://" in base_url else "http://" + base_url)
+        if url.scheme not in ("http", "https"):
+            raise RemoteRenderError(f"不支持的地址: {base_url}")
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.token = token
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn, reusable):
+        if reusable:
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def request(self, method, path, payload=None, sink=None):
+        """Sends one request; returns the decoded JSON answer.
+
+        With sink (a callable taking bytes) a successful body is streamed to it
+        instead and None is returned. A pooled connection the agent has closed
+        in the meantime is replaced and the request sent once more.
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        for attempt in range(2):
+            conn, reused = self._acquire()
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                self._release(conn, False)
+                if reused and attempt == 0:
+                    continue # Stale keep-alive connection
+                raise RemoteRenderError(f"无法连接渲染节点 {self.host}:{self.port}: {e}")
+            except BaseException:
+                self._release(conn, False)
+                raise
+            try:
+                if response.status == 200 and sink is not None:
+                    for chunk in iter(lambda: response.read(STREAM_CHUNK), b""):
+                        sink(chunk)
+                    data = None
+                else:
+                    raw = response.read()
+                    try:
+                        data = json.loads(raw.decode("utf-8")) if raw else {}
+                    except ValueError:
+                        data = {"error": raw[:200].decode("utf-8", "replace")}
+            except (OSError, http.client.HTTPException) as e:
+                self._release(conn, False)
+                raise RemoteRenderError(f"与渲染节点的连接中断: {e}")
+            except BaseException: # e.g. the sink failed writing the download
+                self._release(conn, False)
+                raise
+            self._release(conn, not response.will_close)
+            if response.status >= 400:
+                raise RemoteRenderError(f"渲染节点拒绝请求 ({response.status}): {data.get('error', data)}")
+            return data
+
+    def close(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+
+
+class RenderClient:
+    def __init__(self, agent_url, token=None, timeout=60, log=print):
+        self.pool = ConnectionPool(agent_url, token=token, timeout=timeout)
+        self.log = log
+
+    def close(self):
+        self.pool.close()
+
+    def health(self):
+        info = self.pool.request("GET", "/health")
+        if info.get("protocol") != PROTOCOL_VERSION:
+            raise RemoteRenderError(f"渲染节点协议版本 {info.get('protocol')} 与本机 ({PROTOCOL_VERSION}) 不一致，请更新两端代码")
+        return info
+
+    def submit(self, templates, columns, rows, options=None, batch_rows=BATCH_ROWS, job=None):
+        """Creates a job and uploads rows (lists aligned to columns) in batches; returns the job id."""
+        job_id = uuid.uuid4().hex
+        self.pool.request("POST", "/jobs", {
+            "job_id": job_id, "templates": templates, "columns": columns,
+            "options": options or {}, "total_rows": len(rows),
+        })
+        batches = [rows[i:i + batch_rows] for i in range(0, len(rows), batch_rows)] or [[]]
+        try:
+            for seq, batch in enumerate(batches):
+                if job:
+                    job.checkpoint()
+                payload = {"seq": seq, "rows": batch, "final": seq == len(batches) - 1}
+                try:
+                    self.pool.request("POST", f"/jobs/{job_id}/rows", payload)
+                except RemoteRenderError:
+                    # Sent again once: the agent ignores a batch it already has
+                    self.pool.request("POST", f"/jobs/{job_id}/rows", payload)
+        except BaseException:
+            # Cancelled or a batch failed twice: don't leave a half upload on the agent
+            self.cancel(job_id)
+            raise
+        self.log(f"已提交 {len(rows)} 行到渲染节点 (任务 {job_id})")
+        return job_id
+
+    def status(self, job_id, log_from=0):
+        return self.pool.request("GET", f"/jobs/{job_id}?log_from={log_from}")
+
+    def wait(self, job_id, job=None, poll=POLL_SECONDS):
+        """Polls until the job is done, relaying the agent's log; returns the final status."""
+        log_from = 0
+        last_position = None
+        while True:
+            status = self.status(job_id, log_from)
+            for line in status["log"]:
+                self.log(f"[渲染节点] {line}")
+            log_from = status["log_next"]
+            if status.get("queue_position") and status["queue_position"] != last_position:
+                last_position = status["queue_position"]
+                self.log(f"排队中，前面还有 {last_position - 1} 个任务")
+            if job and status["total"]:
+                job.set_total(status["total"])
+                job.advance(status["done"] - job.done)
+            if status["state"] in ("finished", "failed", "cancelled"):
+                return status
+            if job:
+                try:
+                    job.checkpoint()
+                except JobCancelled:
+                    self.cancel(job_id)
+                    raise
+            time.sleep(poll)
+
+    def fetch(self, job_id, artifacts, output_dir):
+        """Downloads artifacts ([{path, bytes, sha256}]) in parallel; returns the local paths."""
+        # Every path is checked before the first byte is written
+        targets = {artifact["path"]: local_artifact_path(output_dir, artifact["path"]) for artifact in artifacts}
+
+        def download(artifact):
+            path = targets[artifact["path"]]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            digest = hashlib.sha256()
+            part_path = path + ".part"
+            try:
+                with open(part_path, "wb") as f:
+                    def sink(chunk):
+                        digest.update(chunk)
+                        f.write(chunk)
+                    self.pool.request("GET", f"/jobs/{job_id}/artifacts/{urllib.parse.quote(artifact['path'])}", sink=sink)
+            except BaseException: # Dropped connection or failed write: no half file left behind
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
+            if digest.hexdigest() != artifact["sha256"]:
+                os.remove(part_path)
+                raise RemoteRenderError(f"下载校验失败 (SHA-256 不一致): {artifact['path']}")
+            os.replace(part_path, path)
+            return path
+
+        with ThreadPoolExecutor(DOWNLOAD_WORKERS) as pool:
+            return list(pool.map(download, artifacts))
+
+    def cancel(self, job_id):
+        try:
+            self.pool.request("POST", f"/jobs/{job_id}/cancel")
+            self.log(f"已通知渲染节点取消任务 {job_id}")
+        except RemoteRenderError as e:
+            self.log(f"警告: 通知渲染节点取消失败: {e}")
+
+    def delete(self, job_id):
+        return self.pool.request("DELETE", f"/jobs/{job_id}")
+
+
+def select_artifacts(artifacts, fetch="auto", packaged=False):
+    """Which results to download: all, only archives (+ checksums and report), or none."""
+    if fetch == "none":
+        return []
+    if fetch == "all" or (fetch == "auto" and not packaged):
+        return artifacts
+    from output_layout import PACKAGE_DIR
+    return [a for a in artifacts
+            if a["path"].startswith(PACKAGE_DIR + "/") or "/" not in a["path"] and a["path"].endswith(".json")]
+
+
+def render_remote(agent_url, excel_path, template_names, output_dir, layout=None, token=None, log=print, job=None,
+                  batch_rows=BATCH_ROWS, fetch="auto", keep_remote=False):
+    """Renders a cleaned Excel on a render agent and downloads the results.
+
+    Returns the agent's run report (dict), or None if the run failed to start.
+    Image columns hold paths on the agent machine: photo folders are looked up
+    there, like templates, which must exist in the agent's templates/ folder.
+    """
+    from psd_processor import PsdProcessor
+
+    client = RenderClient(agent_url, token=token, log=log)
+    try:
+        info = client.health()
+        mode = " (模拟模式)" if info.get("fake") else ""
+        log(f"已连接渲染节点 {agent_url}{mode}，可用模板: {info['templates']}")
+
+        df = PsdProcessor(log).read_batch_data(excel_path)
+        columns = [str(c) for c in df.columns]
+        rows = [[None if v != v else v for v in row] # NaN -> null
+                for row in df.astype(object).itertuples(index=False, name=None)]
+        options = {}
+        if layout is not None:
+            options = {"shard_by": layout.shard_by, "package": layout.package}
+
+        job_id = client.submit(list(template_names), columns, rows, options, batch_rows=batch_rows, job=job)
+        status = client.wait(job_id, job=job)
+        if status["state"] == "cancelled":
+            raise JobCancelled()
+
+        artifacts = select_artifacts(status.get("artifacts") or [], fetch, packaged=bool(options.get("package")))
+        if artifacts:
+            total = sum(a["bytes"] for a in artifacts)
+            log(f"正在下载 {len(artifacts)} 个文件 ({total / 2 ** 20:.1f} MB) 到 {output_dir}")
+            os.makedirs(output_dir, exist_ok=True)
+            client.fetch(job_id, artifacts, output_dir)
+            log("下载完成，SHA-256 校验通过。")
+
+        if status["state"] == "failed":
+            log(f"❌ 远程渲染失败: {status.get('error')}")
+        elif not keep_remote:
+            client.delete(job_id)
+        return status.get("report")
+    finally:
+        client.close()
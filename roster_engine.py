@@ -0,0 +1,660 @@
+"""Shared engine for reading and parsing technician rosters.
+
+Used by the GUI cleaner (Step 1) and by the command line tools
+(inspect / clean-legacy / verify), so every entry point reads Excel the same
+way and parses the 文案 cell with the same rules.
+
+Reading is streaming (openpyxl read-only mode): the sheet is read once, top
+to bottom, without building an intermediate DataFrame.
+"""
+import os
+import re
+
+# Keywords that identify the header row of a raw roster
+HEADER_KEYWORDS = ["姓名", "门店"]
+HEADER_SCAN_ROWS = 10
+# Raw exports usually have two title rows above the header
+DEFAULT_RAW_HEADER = 2
+# Data rows buffered for content based column detection
+SAMPLE_ROWS = 200
+
+# Output columns of Step 1 (the _清洗版.xlsx layout)
+CLEANED_COLUMNS = ["姓名", "门店", "匠龄", "匠人独白",
+                   "标题1", "描述1", "标题2", "描述2", "标题3", "描述3"]
+# Copied through as an extra last column when the raw roster has it (output sharding by region)
+REGION_COLUMN = "区域"
+# Raw headers accepted as the region column (exact match: "区域经理" is not a region)
+REGION_HEADERS = ("区域", "所属区域", "大区", "片区")
+MAX_SECTIONS = 3
+
+# Pre-compiled patterns (the parser runs once per row on big rosters)
+_WS_RE = re.compile(r'\s+')
+_MULTI_COMMA_RE = re.compile(r'[，,]{2,}')
+_MULTI_PERIOD_RE = re.compile(r'[。.]{2,}')
+_MULTI_EXCL_RE = re.compile(r'[！!]{2,}')
+_MULTI_QUESTION_RE = re.compile(r'[？?]{2,}')
+# Range includes Chinese \u4e00-\u9fa5 and Fullwidth Punctuation \uff00-\uffef
+_CH_PUNCT_RANGE = r'[\u4e00-\u9fa5\uff00-\uffef]'
+_SPACE_AFTER_CH_RE = re.compile(f'(?<={_CH_PUNCT_RANGE})\\s+(?=[\\S])')
+_SPACE_BEFORE_CH_RE = re.compile(f'(?<=[\\S])\\s+(?={_CH_PUNCT_RANGE})')
+_DIGIT_SPACE_RE = re.compile(r'(?<=[\d])\s+(?=[\d+])')
+
+_COLON_SPLIT_RE = re.compile(r"[:：]")
+_SENTENCE_END_RE = re.compile(r'[。！!？?\.]$')
+_MONO_TRAILING_RE = re.compile(r'[。！!.\s,，]+$')
+_EXP_KEYWORD_RE = re.compile(r"匠龄[:：]\s*(\S+)")
+_EXP_DURATION_RE = re.compile(r'((?:近)?\d{1,2}\+?年)')
+_EXP_PREFIX_RE = re.compile(r'^(匠龄|[:：])+')
+_TITLE_ONLY_RE = re.compile(r'^.{2,15}[:：]\s*$')
+_MONO_FALLBACK_RE = re.compile(r"匠人独白[:：]\s*(.*)", re.DOTALL)
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+class SheetReader:
+    """Streams the first worksheet as tuples of cell values.
+
+    .xlsx/.xlsm go through openpyxl's read-only mode; legacy .xls files fall
+    back to pandas (needs xlrd) because openpyxl cannot open them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.max_row = None
+
+    def __iter__(self):
+        if os.path.splitext(self.path)[1].lower() == ".xls":
+            import pandas as pd
+            df = pd.read_excel(self.path, header=None)
+            self.max_row = len(df)
+            for values in df.itertuples(index=False, name=None):
+                yield tuple(None if v != v else v for v in values) # NaN -> None
+            return
+
+        import openpyxl
+        wb = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            self.max_row = ws.max_row
+            for row in ws.iter_rows(values_only=True):
+                yield row
+        finally:
+            wb.close()
+
+
+def cell_str(value):
+    """Cell value as stripped text ('' for empty cells)."""
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def _column_names(header_values):
+    """Same naming as pandas.read_excel: blanks -> 'Unnamed: i', duplicates -> 'x.1'."""
+    names = []
+    seen = {}
+    for i, value in enumerate(header_values):
+        name = value if value not in (None, "") else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def detect_header_row(rows, keywords=HEADER_KEYWORDS):
+    """Index of the first row whose cells contain all keywords, or -1."""
+    for idx, row in enumerate(rows):
+        row_str = " ".join(str(x) for x in row if x is not None)
+        if all(k in row_str for k in keywords):
+            return idx
+    return -1
+
+
+class Roster:
+    """A sheet with its header detected: ``columns`` plus a stream of data rows.
+
+    header: None = auto-detect (falling back to default_header), or a fixed
+    0-based row index. Iterating yields lists aligned to ``columns``; the
+    first ``SAMPLE_ROWS`` rows are also kept in ``sample`` for column
+    detection. A Roster can only be iterated once.
+    """
+
+    def __init__(self, path, header=None, keywords=HEADER_KEYWORDS, default_header=DEFAULT_RAW_HEADER,
+                 sample_size=SAMPLE_ROWS):
+        self.path = path
+        self._reader = SheetReader(path)
+        self._stream = iter(self._reader)
+
+        head = []
+        scan = max(HEADER_SCAN_ROWS, (header if header is not None else default_header) + 1)
+        for row in self._stream:
+            head.append(row)
+            if len(head) >= scan:
+                break
+
+        self.detected = False
+        if header is None:
+            header = detect_header_row(head[:HEADER_SCAN_ROWS], keywords)
+            self.detected = header != -1
+            if header == -1:
+                header = default_header
+        self.header_row = header
+
+        header_values = list(head[header]) if header < len(head) else []
+        self.columns = _column_names(header_values)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+
+        pending = head[header + 1:]
+        while len(pending) < sample_size:
+            row = next(self._stream, None)
+            if row is None:
+                break
+            pending.append(row)
+        self.sample = [self._align(r) for r in pending]
+
+    @property
+    def estimated_rows(self):
+        """Number of data rows according to the sheet dimension (None if unknown)."""
+        if not self._reader.max_row:
+            return None
+        return max(self._reader.max_row - self.header_row - 1, 0)
+
+    def _align(self, row):
+        width = len(self.columns)
+        values = list(row[:width])
+        if len(values) < width:
+            values.extend([None] * (width - len(values)))
+        return values
+
+    def __iter__(self):
+        for row in self.sample:
+            yield row
+        for row in self._stream:
+            yield self._align(row)
+
+    def column(self, idx):
+        """Column name by 0-based position (None if out of range)."""
+        return self.columns[idx] if 0 <= idx < len(self.columns) else None
+
+
+def read_frame(path, header=0):
+    """Whole sheet as a DataFrame through the streaming reader (header row fixed)."""
+    import pandas as pd
+    roster = Roster(path, header=header)
+    return pd.DataFrame(list(roster), columns=roster.columns)
+
+
+# ---------------------------------------------------------------------------
+# Column detection (Step 1)
+# ---------------------------------------------------------------------------
+
+def find_col_by_value_keyword(roster, keywords, search_rows=10):
+    """First column whose first N non-empty sample values mention a keyword."""
+    for col, i in roster.index.items():
+        sample_values = [str(r[i]) for r in roster.sample if r[i] is not None][:search_rows]
+        joined_sample = " ".join(sample_values)
+        if any(k in joined_sample for k in keywords):
+            return col
+    return None
+
+
+def resolve_columns(roster, log=None):
+    """Finds the name / store / content / experience columns of a raw roster.
+
+    Returns a dict with the keys "name", "store", "content", "experience"
+    and "region" (values are column names or None).
+    """
+    log = log or (lambda message: None)
+    columns = roster.columns
+
+    # --- Flexible Column Mapping ---
+    # Identify columns by name rather than fixed index
+    col_map = {}
+    for col in columns:
+        c_str = str(col).strip()
+        if "姓名" in c_str: col_map["name"] = col
+        elif "门店" in c_str: col_map["store"] = col
+        elif c_str in REGION_HEADERS and "region" not in col_map: col_map["region"] = col
+        elif "内容" in c_str or "文案" in c_str or "介绍" in c_str: col_map["content"] = col
+        # If specific column names are known, add them here
+
+    # Fallback if columns not found by name (try standard indices as backup)
+    if "name" not in col_map and len(columns) > 1: col_map["name"] = columns[1]
+
+    # --- Intelligent Column Mapping based on CONTENT ---
+    # Instead of trusting headers, we check the content of the first few rows (non-empty)
+    # to find which column contains the rich text (Skills, Monologue, etc.)
+
+    # 1. Find Content Column (Look for "匠人独白" or "维修技师")
+    content_col_name = find_col_by_value_keyword(roster, ["匠人独白", "维修技师", "深耕", "服务至上"])
+
+    # 2. Find Name Column (Look for "姓名" in header or header-like logic previously done)
+    name_col_name = col_map.get("name")
+
+    # 3. Find Store Column (Look for "门店" in header or "店" in values)
+    if "store" in col_map:
+        store_col_name = col_map["store"]
+    else:
+        store_col_name = find_col_by_value_keyword(roster, ["店", "服务点", "中心"])
+        if not store_col_name and len(columns) > 4: store_col_name = columns[4]
+
+    # 4. Find Experience Column (Look for "匠龄" in header or values)
+    # This is the Safety Net for people like Chen Xin who miss it in the text.
+    exp_col_name = find_col_by_value_keyword(roster, ["匠龄", "年", "从业"])
+    # Fallback if specific column name exists from header detection
+    if "匠龄" in roster.index: exp_col_name = "匠龄"
+
+    log(f"锁定关键列 -> 姓名: [{name_col_name}], 门店: [{store_col_name}], 文案: [{content_col_name}], 匠龄(备用): [{exp_col_name}]")
+    if "region" in col_map:
+        log(f"保留区域列: [{col_map['region']}] (用于按区域分组输出)")
+
+    # Validate
+    if not content_col_name:
+        log("❌ 严重警告: 无法在任何列中找到包含'匠人独白'或'维修技师'的内容。")
+        log("请检查Excel中是否包含完整的文案列。尝试使用默认列索引继续...")
+        # Fallback to old behavior just in case
+        if "content" in col_map: content_col_name = col_map["content"]
+        elif len(columns) > 6: content_col_name = columns[6]
+
+    return {"name": name_col_name, "store": store_col_name,
+            "content": content_col_name, "experience": exp_col_name,
+            "region": col_map.get("region")}
+
+
+def cleaned_columns(roles):
+    """Output columns for a roster: CLEANED_COLUMNS, plus 区域 when the roster has one."""
+    return CLEANED_COLUMNS + [REGION_COLUMN] if roles.get("region") is not None else CLEANED_COLUMNS
+
+
+# ---------------------------------------------------------------------------
+# Parsing (Step 1)
+# ---------------------------------------------------------------------------
+
+def clean_text(text):
+    if not text: return ""
+    text = str(text).strip()
+
+    # 1. Normalize all whitespace
+    text = _WS_RE.sub(' ', text)
+
+    # 2. Fix specific symbols
+    text = text.replace(' +', '+').replace('+ ', '+')
+
+    # 3. Handle Duplicate Punctuation (Cleanup before space removal)
+    # Replace multiple Chinese commas/periods with single ones
+    # Also handles mixed like ",，" or "。."
+    text = _MULTI_COMMA_RE.sub('，', text)
+    text = _MULTI_PERIOD_RE.sub('。', text)
+    text = _MULTI_EXCL_RE.sub('！', text)
+    text = _MULTI_QUESTION_RE.sub('？', text)
+
+    # 4. Remove spaces strictly for Chinese context
+    # Strategy: If a space is adjacent to ANY Chinese character or Full-width Punctuation, remove it.
+    # This covers cases like: "字 “" -> "字“", "字 ，" -> "字，"
+
+    # Remove space AFTER Chinese/Punctuation
+    text = _SPACE_AFTER_CH_RE.sub('', text)
+
+    # Remove space BEFORE Chinese/Punctuation
+    text = _SPACE_BEFORE_CH_RE.sub('', text)
+
+    # 5. Case specific for user: "50+" space removal (Number to Number/Symbol)
+    text = _DIGIT_SPACE_RE.sub('', text)
+
+    return text
+
+
+def parse_intro(full_text, experience=""):
+    """Parses one 文案 cell.
+
+    experience is the fallback value from a separate 匠龄 column. Returns
+    (experience, monologue, [(title, description), ...]) with at most
+    MAX_SECTIONS sections.
+    """
+    monologue = ""
+
+    # --- Advanced Parsing Logic (State Machine Style) ---
+    # To handle both single-line "*Title: Desc" and multi-line "*Title:\nDesc" formats.
+
+    parts_list = [] # Will store (title, description) tuples
+    current_title = ""
+    current_desc_lines = []
+
+    def flush_current_section():
+        nonlocal current_title, current_desc_lines
+        if current_title or current_desc_lines:
+            d_text = " ".join(current_desc_lines).strip()
+
+            # --- Feature Restoration: Ensure description ends with period ---
+            if d_text and not _SENTENCE_END_RE.search(d_text):
+                d_text += "。"
+
+            if current_title or d_text:
+                parts_list.append((current_title, d_text))
+        current_title = ""
+        current_desc_lines = []
+
+    for line in full_text.split('\n'):
+        line = line.strip()
+        if not line: continue
+
+        # 1. Monologue (High Priority)
+        if "匠人独白" in line:
+            flush_current_section() # Close previous section
+            parts = _COLON_SPLIT_RE.split(line, maxsplit=1)
+            if len(parts) > 1:
+                monologue = clean_text(parts[1])
+                # --- Feature Restoration: Remove trailing punctuation ---
+                monologue = _MONO_TRAILING_RE.sub('', monologue)
+            continue
+
+        # 2. Tech / Experience (High Priority)
+        if "维修技师" in line:
+            flush_current_section()
+            # Strategy 1: Look for explicit "匠龄" keyword
+            exp_match = _EXP_KEYWORD_RE.search(line)
+
+            # Strategy 2: If keyword missing, look for standalone duration pattern
+            # Matches: "10+年", "近10年", "20年", "6+年"
+            if not exp_match:
+                exp_match = _EXP_DURATION_RE.search(line)
+
+            if exp_match:
+                raw_exp = exp_match.group(1).strip()
+                # Extra cleanup: remove any accidental "匠龄" or colons if data was malformed
+                # e.g. "匠龄：匠龄：10年" -> "10年"
+                experience = _EXP_PREFIX_RE.sub('', raw_exp).strip()
+
+            # IMPORTANT: REMOVED THE NAME OVERWRITE LOGIC HERE based on User Feedack
+            # We trust the Excel Name Column (A) more than the copy-pasted text content.
+            continue
+
+        # 3. Titles (Lines starting with *)
+        # Also try to detect lines that look like titles even without * if they end with colon
+        is_title_line = False
+        if line.startswith("*") or line.startswith("●") or line.startswith("•"):
+            is_title_line = True
+        # Regex for "Text:" pattern which is likely a title
+        elif _TITLE_ONLY_RE.match(line): # "Short Text:"
+             is_title_line = True
+
+        if is_title_line:
+            # This starts a new section
+            flush_current_section()
+
+            # Try to split if it's "Title: Content" on one line
+            if "：" in line or ":" in line:
+                split_parts = _COLON_SPLIT_RE.split(line, maxsplit=1)
+                t_raw = split_parts[0].strip().replace("*", "").replace("●", "").replace("•", "")
+                d_raw = split_parts[1].strip()
+
+                current_title = clean_text(t_raw)
+                if d_raw:
+                    current_desc_lines.append(clean_text(d_raw))
+            else:
+                # Just a title line without colon? specific case
+                current_title = clean_text(line.replace("*", ""))
+
+        else:
+            # 4. Content Line
+            # If we have a current title, this is its description
+            if current_title:
+                current_desc_lines.append(clean_text(line))
+            else:
+                # Orphaned text? Only if it looks like description content
+                # Check if line contains a colon, might be a Title we missed?
+                if ("：" in line or ":" in line) and len(line) < 50:
+                    # Treat as new title-desc pair
+                    flush_current_section()
+                    split_parts = _COLON_SPLIT_RE.split(line, maxsplit=1)
+                    t_raw = split_parts[0].strip()
+                    d_raw = split_parts[1].strip()
+                    current_title = clean_text(t_raw)
+                    if d_raw:
+                        current_desc_lines.append(clean_text(d_raw))
+                # Otherwise ignore "2025入职" type junk lines that appear before the first title
+
+    # End loop
+    flush_current_section()
+
+    # Fallback: If Monologue is STILL empty, use the specific fallback user rejected?
+    # NO, user said monologue EXISTS. If we fail here, it's better to leave empty
+    # than to guess incorrectly, but we should log it.
+    if not monologue:
+        # Try one last regex on full string in case it wasn't on a single line
+        mono_match = _MONO_FALLBACK_RE.search(full_text)
+        if mono_match:
+            monologue = clean_text(mono_match.group(1))
+
+    return experience, monologue, parts_list[:MAX_SECTIONS]
+
+
+def build_record(name, store, full_text, experience=""):
+    """One cleaned row in CLEANED_COLUMNS layout."""
+    experience, monologue, sections = parse_intro(full_text, experience)
+    # Rows with fewer than three sections get empty title/description cells
+    sections = sections + [("", "")] * (MAX_SECTIONS - len(sections))
+    record = {"姓名": name, "门店": store, "匠龄": experience, "匠人独白": monologue}
+    for i, (title, description) in enumerate(sections, start=1):
+        record[f"标题{i}"] = title
+        record[f"描述{i}"] = description
+    return record
+
+
+def iter_cleaned_records(roster, roles, job=None):
+    """Yields one cleaned record per roster row that has a name.
+
+    Store and region cells are forward-filled (merged cells in the raw export).
+    """
+    name_i = roster.index.get(roles["name"]) if roles["name"] is not None else None
+    store_i = roster.index.get(roles["store"]) if roles["store"] is not None else None
+    content_i = roster.index.get(roles["content"]) if roles["content"] is not None else None
+    exp_i = roster.index.get(roles["experience"]) if roles["experience"] is not None else None
+    region_i = roster.index.get(roles["region"]) if roles.get("region") is not None else None
+
+    last_store = None
+    last_region = None
+    for row in roster:
+        # Cooperative pause/cancel point between rows
+        if job:
+            job.checkpoint()
+            job.advance()
+
+        # Handle Merged Cells for '门店'
+        if store_i is not None:
+            if row[store_i] is not None:
+                last_store = row[store_i]
+            store_value = last_store
+        else:
+            store_value = None
+        if region_i is not None and row[region_i] is not None:
+            last_region = row[region_i]
+
+        # Get Basic Info
+        name = cell_str(row[name_i]) if name_i is not None else ""
+        if not name: continue # Skip empty names
+
+        store = cell_str(store_value)
+        # store = store.replace("某某品牌后缀", "").strip() # 可在此处添加特定品牌后缀清洗逻辑
+
+        # Get Rich Text
+        full_text = cell_str(row[content_i]) if content_i is not None else ""
+
+        # Default Experience from Excel Column (Safety Net)
+        experience = cell_str(row[exp_i]) if exp_i is not None else ""
+
+        record = build_record(name, store, full_text, experience)
+        if region_i is not None:
+            record[REGION_COLUMN] = cell_str(last_region)
+        yield record
+
+
+# ---------------------------------------------------------------------------
+# Legacy parser (former process_data.py)
+# ---------------------------------------------------------------------------
+
+LEGACY_COLUMNS = ["姓名", "门店", "匠龄", "标题1", "描述1", "标题2", "描述2", "标题3", "描述3", "匠人独白"]
+
+_LEGACY_PLUS_RE = re.compile(r'\s*\+\s*')
+_LEGACY_CJK_DIGIT_SPACE_RE = re.compile(r'(?<=[\u4e00-\u9fa5\d+％%])\s+(?=[\u4e00-\u9fa5\d+％%])')
+_LEGACY_CJK_EN_SPACE_RE = re.compile(r'(?<=[\u4e00-\u9fa5])\s+(?=[a-zA-Z])')
+_LEGACY_EN_CJK_SPACE_RE = re.compile(r'(?=[a-zA-Z])\s+(?<=[\u4e00-\u9fa5])')
+_LEGACY_MONO_SPLIT_RE = re.compile("匠人独白[：:]")
+_LEGACY_FIRST_LINE_RE = re.compile(r"\*?\s*维修技师[：:]\s*(.*?)(?:\n|\s{2,}|匠龄|$)")
+_LEGACY_SIMPLE_NAME_RE = re.compile(r"维修技师[：:]\s*(\S+)")
+_LEGACY_EXP_RE = re.compile(r"匠龄[:：]\s*(.*?)(?:\n|\s{2,}|$)")
+_LEGACY_YEAR_RE = re.compile(r"(近?\d+\+?\s*年\+?|\d+余年)")
+_LEGACY_REPEAT_RE = re.compile(r'([\u4e00-\u9fa5]{2,})\1')
+
+
+def clean_text_legacy(text):
+    """Spacing rules of the original process_data.py script."""
+    if not text:
+        return ""
+    # 1. Remove spaces around '+' specific patterns first
+    text = _LEGACY_PLUS_RE.sub('+', text)
+    # 2. Aggressive spacing removal for Chinese context
+    # "15 年" -> "15" is digit, "年" is Chinese. Remove.
+    # "领域 15" -> "领域" Chinese, "15" digit. Remove.
+    text = _LEGACY_CJK_DIGIT_SPACE_RE.sub('', text)
+    text = _LEGACY_CJK_EN_SPACE_RE.sub('', text) # Chinese space English
+    text = _LEGACY_EN_CJK_SPACE_RE.sub('', text) # English space Chinese (lookbehind fixed)
+    return text
+
+
+def build_record_legacy(store, full_text):
+    """The original '*'-separated parser; name and 匠龄 come from the text itself."""
+    name = ""
+    experience = ""
+    monologue = ""
+    titles = ["", "", ""]
+    descriptions = ["", "", ""]
+
+    # --- 1. Extract Monologue (and remove it from main text) ---
+    parts = _LEGACY_MONO_SPLIT_RE.split(full_text, maxsplit=1)
+    if len(parts) > 1:
+        main_content = parts[0]
+        monologue = clean_text_legacy(parts[1].strip())
+        monologue = _MONO_TRAILING_RE.sub('', monologue)
+    else:
+        main_content = full_text
+
+    # --- 2. Extract Name and Experience ---
+    first_line_match = _LEGACY_FIRST_LINE_RE.search(main_content)
+    if first_line_match:
+        potential_name = first_line_match.group(1).strip()
+        if len(potential_name) <= 5 and not re.search(r'[0-9年]', potential_name):
+            name = potential_name
+
+    if not name:
+        simple_match = _LEGACY_SIMPLE_NAME_RE.search(main_content)
+        if simple_match:
+            cand = simple_match.group(1).split("匠龄")[0]
+            if len(cand) <= 4 and not re.search(r'\d', cand) and "年" not in cand:
+                name = cand
+
+    exp_match = _LEGACY_EXP_RE.search(main_content)
+    if exp_match:
+        experience = exp_match.group(1).strip()
+    if experience:
+        experience = experience.replace("匠龄：", "").replace("匠龄:", "").strip()
+    if not experience:
+        year_match = _LEGACY_YEAR_RE.search(main_content)
+        if year_match:
+            experience = year_match.group(1)
+    if experience:
+        experience = clean_text_legacy(experience)
+        experience = re.sub(r"(\d+)\+年", r"\1年+", experience)
+
+    # --- 3. Extract 3 Description Blocks ---
+    raw_segments = [s.strip() for s in main_content.split('*') if s.strip()]
+    valid_segments = []
+    for seg in raw_segments:
+        if "维修技师" in seg or ("匠龄" in seg and len(seg) < 30):
+            continue
+        if "：" in seg or ":" in seg:
+            valid_segments.append(seg)
+
+    for i in range(min(MAX_SECTIONS, len(valid_segments))):
+        seg = valid_segments[i]
+        if "：" in seg:
+            t, d = seg.split("：", 1)
+        else:
+            t, d = seg.split(":", 1)
+        t = clean_text_legacy(t).strip()
+        d = clean_text_legacy(d).strip()
+        # Simple check for repeated words like "维修维修" (only strictly adjacent)
+        d = _LEGACY_REPEAT_RE.sub(r'\1', d)
+        if d and not d.endswith(('。', '！', '!', '.', '…')):
+            d += "。"
+        titles[i] = t
+        descriptions[i] = d
+
+    return {
+        "姓名": name, "门店": store, "匠龄": experience,
+        "标题1": titles[0], "描述1": descriptions[0],
+        "标题2": titles[1], "描述2": descriptions[1],
+        "标题3": titles[2], "描述3": descriptions[2],
+        "匠人独白": monologue,
+    }
+
+
+def iter_legacy_records(roster, name_col=1, store_col=4, content_col=6):
+    """Legacy clean with fixed column positions (0-based), as process_data.py did."""
+    for row in roster:
+        # Filter rows where the name column is empty
+        if name_col >= len(row) or row[name_col] is None:
+            continue
+        store = cell_str(row[store_col]) if store_col < len(row) else ""
+        full_text = cell_str(row[content_col]) if content_col < len(row) else ""
+        yield build_record_legacy(store, full_text)
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+class XlsxRecordWriter:
+    """Appends records to a new xlsx with openpyxl's write-only mode.
+
+    Appended rows are streamed to a temporary file by openpyxl, so memory
+    does not grow with the number of rows. Nothing is written to
+    output_path before close().
+    """
+
+    def __init__(self, output_path, columns=CLEANED_COLUMNS, title="Sheet1"):
+        import openpyxl
+        self.output_path = output_path
+        self.columns = list(columns)
+        self.rows = 0
+        self._wb = openpyxl.Workbook(write_only=True)
+        self._ws = self._wb.create_sheet(title)
+        self._ws.append(self.columns)
+
+    def append(self, records):
+        for record in records:
+            self._ws.append([record.get(c, "") for c in self.columns])
+            self.rows += 1
+
+    def close(self):
+        self._wb.save(self.output_path)
+
+    def abort(self):
+        """Stops writing without creating output_path (openpyxl removes its temp file at exit)."""
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+def write_records_xlsx(records, output_path, columns=CLEANED_COLUMNS):
+    """Writes records with openpyxl's write-only mode (streams rows to disk)."""
+    writer = XlsxRecordWriter(output_path, columns, title="Sheet")
+    writer.append(records)
+    writer.close()
+    return writer.rows
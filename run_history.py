@@ -0,0 +1,233 @@
+"""Local SQLite history of clean and generate runs.
+
+Every Step 1 clean (clean_pipeline) and every real generation run
+(psd_processor) records its rows, duration, per-stage times, failures, host
+and the version of each template used; generation runs also record every
+row's time and the length of its longest text cell. `workshop_cli.py
+history` reads it back: throughput per run, the slowest rows and the speed
+of each template version compared with the previous one.
+
+Recording is best effort: a locked or unwritable database never stops a run.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, "run_history.sqlite3")
+
+# Bump (and extend migrate()) when the tables change
+DB_VERSION = 1
+
+# A template version is flagged when its median time per row is this much slower than the previous one
+REGRESSION_RATIO = 1.2
+# Versions with fewer rendered rows are reported but never flagged
+MIN_REGRESSION_ROWS = 20
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,            -- clean / generate
+    started TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    status TEXT NOT NULL,          -- finished / cancelled / failed
+    host TEXT,
+    input TEXT,
+    rows INTEGER NOT NULL,
+    ok INTEGER NOT NULL DEFAULT 0,
+    partial INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    templates TEXT,                -- JSON {name: version}
+    stages TEXT,                   -- JSON {stage: seconds}
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS run_rows (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    name TEXT,
+    store TEXT,
+    template TEXT,
+    template_version TEXT,
+    status TEXT,
+    seconds REAL,
+    retries INTEGER,
+    text_chars INTEGER,            -- length of the longest mapped text cell
+    longest_column TEXT,
+    failures TEXT
+);
+CREATE INDEX IF NOT EXISTS run_rows_run ON run_rows(run_id);
+CREATE INDEX IF NOT EXISTS run_rows_template ON run_rows(template, template_version);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+"""
+
+
+class StageTimer:
+    """Accumulates wall time per named stage: `with stages("read"): ...`."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextlib.contextmanager
+    def __call__(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def to_dict(self):
+        return {name: round(seconds, 3) for name, seconds in self.seconds.items()}
+
+
+_version_cache = {}
+
+
+def template_version(template):
+    """Short content hash of a template: its PSD plus its mapping file.
+
+    Cached per process by size and mtime, so a large PSD is hashed once.
+    """
+    paths = [p for p in (template.psd_path, template.source) if p and os.path.exists(p)]
+    key = tuple((p, os.path.getsize(p), os.path.getmtime(p)) for p in paths)
+    if key not in _version_cache:
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        _version_cache[key] = digest.hexdigest()[:12] if paths else None
+    return _version_cache[key]
+
+
+def connect(db_path=None):
+    """Opens (and creates) the history database."""
+    conn = sqlite3.connect(db_path or DEFAULT_DB_PATH, timeout=5)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < DB_VERSION:
+        with conn:
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {DB_VERSION}")
+    return conn
+
+
+def record_run(kind, started, seconds, status, rows, input_path=None, counts=None, templates=None,
+               stages=None, error=None, row_records=(), db_path=None):
+    """Stores one run; returns its id.
+
+    counts: {ok, partial, failed, skipped}; templates: {name: version};
+    row_records: dicts with the run_rows columns (generation runs only).
+    """
+    counts = counts or {}
+    conn = connect(db_path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (kind, started, seconds, status, host, input, rows, ok, partial, failed, skipped,"
+                " templates, stages, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, started, round(seconds, 3), status, socket.gethostname(),
+                 os.path.basename(input_path) if input_path else None, rows,
+                 counts.get("ok", 0), counts.get("partial", 0), counts.get("failed", 0), counts.get("skipped", 0),
+                 json.dumps(templates or {}, ensure_ascii=False), json.dumps(stages or {}), error))
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO run_rows (run_id, row, name, store, template, template_version, status, seconds,"
+                " retries, text_chars, longest_column, failures)"
+                " VALUES (:run_id, :row, :name, :store, :template, :template_version, :status, :seconds,"
+                " :retries, :text_chars, :longest_column, :failures)",
+                ({"run_id": run_id, **r} for r in row_records))
+        return run_id
+    finally:
+        conn.close()
+
+
+def since(days):
+    """Start timestamp of the last `days` days (None = everything)."""
+    if not days:
+        return "0000"
+    return time.strftime(TIME_FORMAT, time.localtime(time.time() - days * 86400))
+
+
+def recent_runs(conn, days=30, kind=None):
+    """Runs of the last days, oldest first, with rows_per_minute added."""
+    query = "SELECT * FROM runs WHERE started >= ?"
+    params = [since(days)]
+    if kind:
+        query += " AND kind = ?"
+        params.append(kind)
+    runs = []
+    for row in conn.execute(query + " ORDER BY started, id", params):
+        run = dict(row)
+        run["templates"] = json.loads(run["templates"] or "{}")
+        run["stages"] = json.loads(run["stages"] or "{}")
+        run["rows_per_minute"] = run["rows"] * 60 / run["seconds"] if run["seconds"] else None
+        runs.append(run)
+    return runs
+
+
+def slowest_rows(conn, days=30, limit=10, template=None):
+    """The slowest rendered rows, with their longest text cell."""
+    query = ("SELECT r.*, runs.started, runs.host FROM run_rows r JOIN runs ON runs.id = r.run_id"
+             " WHERE runs.started >= ? AND r.seconds IS NOT NULL")
+    params = [since(days)]
+    if template:
+        query += " AND r.template = ?"
+        params.append(template)
+    query += " ORDER BY r.seconds DESC LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in conn.execute(query, params)]
+
+
+def template_versions(conn, template=None):
+    """Speed of every template version in the order they were first used.
+
+    Returns dicts (template, version, first_used, last_used, runs, rows,
+    median_seconds, change, regression); change is the ratio to the
+    previous version of the same template.
+    """
+    query = ("SELECT r.template, r.template_version, r.seconds, runs.id AS run_id, runs.started"
+             " FROM run_rows r JOIN runs ON runs.id = r.run_id"
+             " WHERE r.status IN ('ok', 'partial') AND r.seconds IS NOT NULL")
+    params = []
+    if template:
+        query += " AND r.template = ?"
+        params.append(template)
+    versions = {}
+    for row in conn.execute(query, params):
+        key = (row["template"], row["template_version"])
+        entry = versions.setdefault(key, {"template": key[0], "version": key[1], "first_used": row["started"],
+                                          "last_used": row["started"], "run_ids": set(), "seconds": []})
+        entry["first_used"] = min(entry["first_used"], row["started"])
+        entry["last_used"] = max(entry["last_used"], row["started"])
+        entry["run_ids"].add(row["run_id"])
+        entry["seconds"].append(row["seconds"])
+
+    result = []
+    previous = {}
+    for entry in sorted(versions.values(), key=lambda e: (e["template"], e["first_used"])):
+        median = statistics.median(entry["seconds"])
+        before = previous.get(entry["template"])
+        change = median / before["median_seconds"] if before and before["median_seconds"] else None
+        item = {
+            "template": entry["template"], "version": entry["version"],
+            "first_used": entry["first_used"], "last_used": entry["last_used"],
+            "runs": len(entry["run_ids"]), "rows": len(entry["seconds"]),
+            "median_seconds": median, "change": change,
+        }
+        item["regression"] = bool(change and change >= REGRESSION_RATIO and item["rows"] >= MIN_REGRESSION_ROWS
+                                  and before["rows"] >= MIN_REGRESSION_ROWS)
+        result.append(item)
+        previous[entry["template"]] = item
+    return result
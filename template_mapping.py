@@ -0,0 +1,260 @@
+"""Declarative column -> layer mappings, one JSON file per poster template.
+
+templates/technician.json:
+    {
+      "name": "technician",
+      "title": "维修师海报",
+      "psd": "model/维修师-模板.psd",
+      "fields": [
+        {"column": "姓名", "layer": "姓名"},
+        {"column": "描述1", "layer": "内容/描述1", "fit": "wrap", "width": 620},
+        {"column": "匠人独白", "transforms": ["single_line", "no_trailing_punct"]}
+      ]
+    }
+
+"layer" is a layer name (searched recursively, like before) or a path of
+group names separated by "/". It defaults to the column name.
+
+Portraits go into Smart Object layers:
+      "images": [
+        {"layer": "照片", "size": [600, 800], "column": "照片", "folder": "photos"}
+      ]
+"size" is the pixel size of the Smart Object's contents. The photo comes
+from the image column (a file path) or is looked up in "folder" by name and
+store (see photo_cache.find_photo).
+
+Text cells may contain style markup such as **粗体** or {brand:4000枚+}
+(see text_markup); "colors" names the template's palette:
+      "colors": {"brand": "#E60012"}
+"""
+import json
+import os
+import re
+
+import text_markup
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+DEFAULT_TEMPLATE = "technician"
+
+# none: only replace the text | wrap: set the paragraph box width (needs width)
+# shrink: scale the font down when longer than max_chars | truncate: cut at max_chars
+FIT_POLICIES = ("none", "wrap", "shrink", "truncate")
+
+# Smallest font scale used by the "shrink" policy
+MIN_SHRINK = 0.6
+
+# cover: crop to fill the Smart Object | contain: fit inside, padded with white
+PHOTO_FITS = ("cover", "contain")
+
+
+def _ensure_period(text):
+    if text and not re.search(r'[。！!？?\.…]$', text):
+        text += "。"
+    return text
+
+
+TRANSFORMS = {
+    "strip": lambda t: t.strip(),
+    "single_line": lambda t: re.sub(r"\s*\n\s*", " ", t),
+    "upper": lambda t: t.upper(),
+    "lower": lambda t: t.lower(),
+    "no_trailing_punct": lambda t: re.sub(r'[。！!.\s,，]+$', '', t),
+    "ensure_period": _ensure_period,
+}
+
+
+class TemplateConfigError(ValueError):
+    """A template mapping file is missing, unreadable or invalid."""
+
+
+class FieldMapping:
+    def __init__(self, column, layer=None, width=None, fit="none", max_chars=None, transforms=()):
+        self.column = column
+        self.layer = layer or column
+        self.width = width
+        self.fit = fit
+        self.max_chars = max_chars
+        self.transforms = list(transforms)
+
+    @property
+    def layer_name(self):
+        """Last path component, used in logs and reports."""
+        return self.layer.split("/")[-1]
+
+    def apply(self, text, colors=None):
+        """Runs the transforms, parses the style markup and truncates; returns StyledText.
+
+        Broken markup is not fatal: the cell is written as is and the
+        reason is left in StyledText.error for the report.
+        """
+        for name in self.transforms:
+            text = TRANSFORMS[name](text)
+        try:
+            styled = text_markup.parse(text, colors or {})
+        except text_markup.MarkupError as e:
+            styled = text_markup.StyledText(text, error=str(e))
+        if self.fit == "truncate":
+            styled = styled.truncate(self.max_chars)
+        return styled
+
+    @classmethod
+    def from_dict(cls, data, where):
+        if not isinstance(data, dict):
+            raise TemplateConfigError(f"{where}: 每个字段必须是对象")
+        unknown = set(data) - {"column", "layer", "width", "fit", "max_chars", "transforms"}
+        if unknown:
+            raise TemplateConfigError(f"{where}: 未知的配置项 {sorted(unknown)}")
+        column = data.get("column")
+        if not isinstance(column, str) or not column:
+            raise TemplateConfigError(f"{where}: 缺少 column")
+        layer = data.get("layer")
+        if layer is not None and (not isinstance(layer, str) or not layer.strip("/")):
+            raise TemplateConfigError(f"{where}: layer 必须是图层名或 '组/图层' 路径")
+
+        fit = data.get("fit", "none")
+        if fit not in FIT_POLICIES:
+            raise TemplateConfigError(f"{where}: fit 必须是 {FIT_POLICIES} 之一，而不是 {fit!r}")
+        width = data.get("width")
+        if width is not None and (not isinstance(width, (int, float)) or width <= 0):
+            raise TemplateConfigError(f"{where}: width 必须是正数 (像素)")
+        if fit == "wrap" and width is None:
+            raise TemplateConfigError(f"{where}: fit=wrap 需要指定 width")
+        max_chars = data.get("max_chars")
+        if max_chars is not None and (not isinstance(max_chars, int) or max_chars <= 1):
+            raise TemplateConfigError(f"{where}: max_chars 必须是大于 1 的整数")
+        if fit in ("shrink", "truncate") and max_chars is None:
+            raise TemplateConfigError(f"{where}: fit={fit} 需要指定 max_chars")
+
+        transforms = data.get("transforms", [])
+        if not isinstance(transforms, list):
+            raise TemplateConfigError(f"{where}: transforms 必须是列表")
+        for name in transforms:
+            if name not in TRANSFORMS:
+                raise TemplateConfigError(f"{where}: 未知的 transform {name!r} (可用: {sorted(TRANSFORMS)})")
+
+        return cls(column, layer.strip("/") if layer else None, width, fit, max_chars, transforms)
+
+
+class ImageMapping:
+    def __init__(self, layer, size, column=None, folder=None, fit="cover"):
+        self.layer = layer
+        self.size = tuple(size)
+        self.column = column
+        self.folder = folder
+        self.fit = fit
+
+    @property
+    def layer_name(self):
+        return self.layer.split("/")[-1]
+
+    @classmethod
+    def from_dict(cls, data, where):
+        if not isinstance(data, dict):
+            raise TemplateConfigError(f"{where}: 每个图片必须是对象")
+        unknown = set(data) - {"layer", "size", "column", "folder", "fit"}
+        if unknown:
+            raise TemplateConfigError(f"{where}: 未知的配置项 {sorted(unknown)}")
+        layer = data.get("layer")
+        if not isinstance(layer, str) or not layer.strip("/"):
+            raise TemplateConfigError(f"{where}: 缺少 layer (智能对象图层名或 '组/图层' 路径)")
+        size = data.get("size")
+        if (not isinstance(size, list) or len(size) != 2
+                or not all(isinstance(v, int) and v > 0 for v in size)):
+            raise TemplateConfigError(f"{where}: size 必须是 [宽, 高] 像素")
+        column, folder = data.get("column"), data.get("folder")
+        if column is not None and (not isinstance(column, str) or not column):
+            raise TemplateConfigError(f"{where}: column 必须是列名")
+        if folder is not None and (not isinstance(folder, str) or not folder):
+            raise TemplateConfigError(f"{where}: folder 必须是目录路径")
+        if column is None and folder is None:
+            raise TemplateConfigError(f"{where}: 需要 column 或 folder 指定照片来源")
+        fit = data.get("fit", "cover")
+        if fit not in PHOTO_FITS:
+            raise TemplateConfigError(f"{where}: fit 必须是 {PHOTO_FITS} 之一，而不是 {fit!r}")
+
+        # Relative folders are relative to the project root, like the PSD path
+        if folder and not os.path.isabs(folder):
+            folder = os.path.normpath(os.path.join(BASE_DIR, folder))
+        return cls(layer.strip("/"), size, column, folder, fit)
+
+
+class TemplateMapping:
+    """One poster template: its PSD plus how cleaned columns map onto layers."""
+
+    def __init__(self, name, title, psd_path, fields, source=None, images=(), colors=None):
+        self.name = name
+        self.title = title or name
+        self.psd_path = psd_path
+        self.fields = fields
+        self.source = source
+        self.images = list(images)
+        # Named colours for {name:text} markup, on top of text_markup.DEFAULT_COLORS
+        self.colors = dict(colors or {})
+
+    @property
+    def columns(self):
+        return [f.column for f in self.fields] + [i.column for i in self.images if i.column]
+
+    @classmethod
+    def load(cls, path):
+        """Loads and validates a mapping file; raises TemplateConfigError."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except OSError as e:
+            raise TemplateConfigError(f"无法读取模板配置 {path}: {e}")
+        except ValueError as e:
+            raise TemplateConfigError(f"模板配置不是合法的 JSON ({path}): {e}")
+
+        where = os.path.basename(path)
+        if not isinstance(data, dict):
+            raise TemplateConfigError(f"{where}: 顶层必须是对象")
+        name = data.get("name") or os.path.splitext(where)[0]
+        psd = data.get("psd")
+        if not isinstance(psd, str) or not psd:
+            raise TemplateConfigError(f"{where}: 缺少 psd (模板文件路径)")
+        raw_fields = data.get("fields")
+        if not isinstance(raw_fields, list) or not raw_fields:
+            raise TemplateConfigError(f"{where}: fields 不能为空")
+
+        fields = [FieldMapping.from_dict(d, f"{where} fields[{i}]") for i, d in enumerate(raw_fields)]
+        raw_images = data.get("images", [])
+        if not isinstance(raw_images, list):
+            raise TemplateConfigError(f"{where}: images 必须是列表")
+        images = [ImageMapping.from_dict(d, f"{where} images[{i}]") for i, d in enumerate(raw_images)]
+        colors = data.get("colors", {})
+        if not isinstance(colors, dict):
+            raise TemplateConfigError(f"{where}: colors 必须是 {{名称: \"#RRGGBB\"}} 对象")
+        for color_name, value in colors.items():
+            if not re.fullmatch(r"[A-Za-z][\w-]*", color_name):
+                raise TemplateConfigError(f"{where}: 颜色名 {color_name!r} 只能包含字母、数字、_ 和 -，且以字母开头")
+            if not isinstance(value, str) or not text_markup.HEX_COLOR_RE.fullmatch(value):
+                raise TemplateConfigError(f"{where}: 颜色 {color_name} 必须是 \"#RRGGBB\" 格式")
+        layers = [f.layer for f in fields] + [i.layer for i in images]
+        duplicates = sorted({l for l in layers if layers.count(l) > 1})
+        if duplicates:
+            raise TemplateConfigError(f"{where}: 多个字段写入同一图层 {duplicates}")
+
+        # Relative PSD paths are relative to the project root
+        psd_path = psd if os.path.isabs(psd) else os.path.join(BASE_DIR, psd)
+        return cls(name, data.get("title"), os.path.normpath(psd_path), fields, source=path, images=images,
+                   colors=colors)
+
+
+def list_templates(templates_dir=TEMPLATES_DIR):
+    """Returns {name: path} for every mapping file in the templates directory."""
+    if not os.path.isdir(templates_dir):
+        return {}
+    return {os.path.splitext(f)[0]: os.path.join(templates_dir, f)
+            for f in sorted(os.listdir(templates_dir)) if f.endswith(".json")}
+
+
+def load_template(name_or_path, templates_dir=TEMPLATES_DIR):
+    """Loads a template by name (templates/<name>.json) or by file path."""
+    if os.path.isfile(name_or_path):
+        return TemplateMapping.load(name_or_path)
+    available = list_templates(templates_dir)
+    if name_or_path not in available:
+        raise TemplateConfigError(f"未找到模板配置 '{name_or_path}' (可用: {sorted(available)})")
+    return TemplateMapping.load(available[name_or_path])
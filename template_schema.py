@@ -0,0 +1,149 @@
+import json
+import os
+import statistics
+import time
+
+# Bump when the layout of the cache file changes
+SCHEMA_VERSION = 1
+
+# Used for the ETA when no real run has been recorded yet
+DEFAULT_ROW_SECONDS = 3.0
+DEFAULT_OPEN_SECONDS = 10.0
+MAX_TIMING_SAMPLES = 500
+
+# Photoshop's default auto-leading is 120% of the font size
+AUTO_LEADING = 1.2
+
+
+def schema_path_for(template_path):
+    """The cache lives next to the PSD, e.g. model/维修师-模板.schema.json"""
+    return os.path.splitext(template_path)[0] + ".schema.json"
+
+
+def template_fingerprint(template_path):
+    """Cheap change detection for the PSD (size + mtime); None if the PSD is absent."""
+    if not os.path.exists(template_path):
+        return None
+    st = os.stat(template_path)
+    return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def load_schema(template_path):
+    """Returns the cached schema dict, or None if there is no usable cache."""
+    path = schema_path_for(template_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("schema_version") != SCHEMA_VERSION:
+        return None
+    return data
+
+
+def save_schema(template_path, data):
+    data["schema_version"] = SCHEMA_VERSION
+    path = schema_path_for(template_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_stale(schema, template_path):
+    """True if the PSD exists and no longer matches the fingerprint in the cache.
+
+    When the PSD itself is not present (e.g. on CI) the cache is trusted as is.
+    """
+    current = template_fingerprint(template_path)
+    if current is None:
+        return False
+    return schema.get("fingerprint") != current
+
+
+def find_layer(node, layer_name):
+    """Mirror of PsdProcessor.find_layer on the cached layer tree."""
+    children = node.get("children", [])
+    for layer in children:
+        if layer["name"] == layer_name:
+            return layer
+    for layer in children:
+        if layer["type"] == "LayerSet":
+            found = find_layer(layer, layer_name)
+            if found:
+                return found
+    return None
+
+
+def find_layer_path(schema, layer_path):
+    """Mirror of PsdProcessor.find_layer_path ('Group/Layer' or a plain name)."""
+    parts = [p for p in layer_path.split("/") if p]
+    if len(parts) == 1:
+        return find_layer(schema, parts[0])
+    node = schema
+    for part in parts:
+        node = next((c for c in node.get("children", []) if c["name"] == part), None)
+        if node is None:
+            return None
+    return node
+
+
+def resolve_layer(schema, layer_path):
+    """Same group-unwrapping rule as PsdProcessor.set_text_layer."""
+    layer = find_layer_path(schema, layer_path)
+    if layer and layer["type"] == "LayerSet":
+        inner = find_layer(layer, layer_path.split("/")[-1])
+        if inner:
+            layer = inner
+    return layer
+
+
+def visual_length(text):
+    """Approximate width in em: CJK/full-width glyphs count 1, ASCII counts 0.5."""
+    return sum(1.0 if ord(ch) > 0xFF else 0.5 for ch in text if ch != "\n")
+
+
+def estimate_capacity(layer):
+    """Roughly how many em fit in a text layer, or None if it cannot be estimated.
+
+    Paragraph text uses the box size and font size; point text only has a
+    capacity if the template author put ``max_chars`` into the cache.
+    """
+    if layer.get("max_chars"):
+        return layer["max_chars"]
+    box = layer.get("box_px")
+    font_px = layer.get("font_px")
+    if not layer.get("paragraph") or not box or not font_px:
+        return None
+    per_line = int(box[0] // font_px)
+    lines = int(box[1] // (font_px * AUTO_LEADING))
+    if per_line <= 0 or lines <= 0:
+        return None
+    return per_line * lines
+
+
+def record_timings(template_path, row_seconds, open_seconds=None):
+    """Append the per-row timings of a real run to the cache (used for dry-run ETA)."""
+    schema = load_schema(template_path)
+    if schema is None or not row_seconds:
+        return
+    timings = schema.setdefault("timings", {})
+    samples = timings.get("row_seconds", []) + [round(s, 3) for s in row_seconds]
+    timings["row_seconds"] = samples[-MAX_TIMING_SAMPLES:]
+    if open_seconds is not None:
+        timings["open_seconds"] = round(open_seconds, 3)
+    timings["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    save_schema(template_path, schema)
+
+
+def estimate_run_seconds(schema, row_count):
+    """Returns (seconds, based_on_history)."""
+    timings = (schema or {}).get("timings", {})
+    samples = timings.get("row_seconds") or []
+    if samples:
+        per_row = statistics.median(samples)
+        open_s = timings.get("open_seconds", DEFAULT_OPEN_SECONDS)
+        return open_s + per_row * row_count, True
+    return DEFAULT_OPEN_SECONDS + DEFAULT_ROW_SECONDS * row_count, False
@@ -0,0 +1,136 @@
+"""Inline style markup for text fields.
+
+    **4000枚+**            faux bold
+    {brand:4000枚+}        colour from the template palette (or built-in names)
+    {#E60012:4000枚+}      explicit RGB colour
+    {brand:**4000枚+**}    both (markup can be nested)
+    \\* \\{ \\}               literal characters
+
+parse() turns a cell into the plain text written to the layer plus a list of
+style runs; psd_processor applies all runs of a layer in one Photoshop call.
+A lone "}" without an open colour is kept as text, so ordinary braces in the
+roster are unaffected.
+"""
+import re
+
+# Colours every template can use; a template adds its own with "colors"
+DEFAULT_COLORS = {
+    "red": "#E60012",
+    "orange": "#FF7A00",
+    "black": "#000000",
+    "white": "#FFFFFF",
+}
+
+HEX_COLOR_RE = re.compile(r"#[0-9A-Fa-f]{6}")
+TOKEN_RE = re.compile(r"\\([*{}])|\*\*|\{(#[0-9A-Fa-f]{6}|[A-Za-z][\w-]*):|\}")
+# Quick check that lets plain cells skip the tokenizer
+MARKUP_CHARS_RE = re.compile(r"[*{}\\]")
+
+
+class MarkupError(ValueError):
+    """Unbalanced markup or an unknown colour name."""
+
+
+def hex_to_rgb(value):
+    return tuple(int(value[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def utf16_len(text):
+    """Length in UTF-16 code units, the unit Photoshop uses for text offsets."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+class StyledText:
+    """Plain text plus style runs (start, end, bold, (r, g, b) or None) in UTF-16 offsets.
+
+    error is set when the markup could not be parsed; text is then the cell as written.
+    """
+
+    def __init__(self, text, runs=(), error=None):
+        self.text = text
+        self.runs = list(runs)
+        self.error = error
+
+    def truncate(self, max_chars):
+        """Cuts the plain text at max_chars (ending with "…") and clips the runs."""
+        if len(self.text) <= max_chars:
+            return self
+        kept = self.text[:max_chars - 1]
+        end = utf16_len(kept)
+        runs = [(start, min(stop, end), bold, color) for start, stop, bold, color in self.runs if start < end]
+        return StyledText(kept + "…", runs, self.error)
+
+
+def parse(text, colors=None):
+    """Parses markup; raises MarkupError.
+
+    colors maps names to "#RRGGBB" (case-insensitive, on top of DEFAULT_COLORS).
+    With colors=None any colour name is accepted and not resolved, which is
+    enough to measure the plain text.
+    """
+    if not MARKUP_CHARS_RE.search(text):
+        return StyledText(text)
+
+    palette = None
+    if colors is not None:
+        palette = {k.lower(): v for k, v in DEFAULT_COLORS.items()}
+        palette.update((k.lower(), v) for k, v in colors.items())
+
+    pieces = []  # (text, bold, color)
+    bold = False
+    color_stack = []
+    pos = 0
+    for m in TOKEN_RE.finditer(text):
+        token = m.group(0)
+        color = color_stack[-1] if color_stack else None
+        if m.start() > pos:
+            pieces.append((text[pos:m.start()], bold, color))
+        pos = m.end()
+        if m.group(1):
+            pieces.append((m.group(1), bold, color))
+        elif token == "**":
+            bold = not bold
+        elif token == "}":
+            if color_stack:
+                color_stack.pop()
+            else:
+                pieces.append((token, bold, color))
+        else:
+            name = m.group(2)
+            if HEX_COLOR_RE.fullmatch(name):
+                value = hex_to_rgb(name)
+            elif palette is None:
+                value = name
+            elif name.lower() in palette:
+                value = hex_to_rgb(palette[name.lower()])
+            else:
+                raise MarkupError(f"未知的颜色 '{name}' (可用: {', '.join(sorted(palette))})")
+            color_stack.append(value)
+    if pos < len(text):
+        pieces.append((text[pos:], bold, color_stack[-1] if color_stack else None))
+    if bold:
+        raise MarkupError("** 没有成对出现")
+    if color_stack:
+        raise MarkupError("{颜色: 缺少对应的 }")
+
+    plain = []
+    runs = []
+    offset = 0
+    for piece, piece_bold, piece_color in pieces:
+        length = utf16_len(piece)
+        if piece_bold or piece_color is not None:
+            if runs and runs[-1][1] == offset and runs[-1][2:] == (piece_bold, piece_color):
+                runs[-1] = (runs[-1][0], offset + length, piece_bold, piece_color)
+            else:
+                runs.append((offset, offset + length, piece_bold, piece_color))
+        plain.append(piece)
+        offset += length
+    return StyledText("".join(plain), runs)
+
+
+def plain_text(text):
+    """The text without markup (the cell itself if the markup is broken)."""
+    try:
+        return parse(text).text
+    except MarkupError:
+        return text
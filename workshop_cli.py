@@ -0,0 +1,300 @@
+"""Command line entry points for the design workshop (no GUI required).
+
+Usage:
+    python workshop_cli.py dry-run data/xxx_清洗版.xlsx [--template technician] [--strict]
+    python workshop_cli.py inspect data/原始表.xlsx [--column 1] [--rows 10]
+    python workshop_cli.py clean-legacy data/原始表.xlsx [-o data/维修师数据_清洗版.xlsx]
+    python workshop_cli.py verify data/xxx_清洗版.xlsx [--store 盐城]
+    python workshop_cli.py render data/xxx_清洗版.xlsx --agent http://设计机:8765 [--package]
+    python workshop_cli.py history [--days 30] [--kind generate] [--template technician]
+
+The dry run never touches Photoshop, so it also works on Linux (e.g. as a CI
+gate for every new cleaned file).
+"""
+import argparse
+import json
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'output_psds')
+
+
+def load_template_args(args):
+    """--template (name or mapping file, repeatable for fan-out) plus an optional --psd override."""
+    from template_mapping import DEFAULT_TEMPLATE, load_template
+
+    templates = [load_template(name) for name in (args.template or [DEFAULT_TEMPLATE])]
+    if args.psd:
+        if len(templates) > 1:
+            raise SystemExit("--psd 只能与单个 --template 一起使用")
+        templates[0].psd_path = os.path.abspath(args.psd)
+    return templates
+
+
+def cmd_dry_run(args):
+    from output_layout import OutputLayout
+    from psd_processor import PsdProcessor
+
+    templates = load_template_args(args)
+    tool = PsdProcessor(print)
+    if args.rules:
+        tool.rules_path = args.rules
+    report = tool.process_batch(args.excel, templates, args.output, dry_run=True,
+                                layout=OutputLayout(args.shard_by))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "excel": report.excel_path,
+                "templates": report.templates,
+                "rows": report.row_count,
+                "estimated_seconds": report.estimated_seconds,
+                "estimate_from_history": report.estimate_from_history,
+                "planned_files": report.planned_files,
+                "issues": [{"level": i.level, "row": i.row, "message": i.message} for i in report.issues],
+            }, f, ensure_ascii=False, indent=2)
+
+    if report.errors or (args.strict and report.warnings):
+        return 1
+    return 0
+
+
+def cmd_inspect(args):
+    from roster_engine import Roster, resolve_columns
+
+    roster = Roster(args.excel, header=args.header)
+    if roster.detected:
+        print(f"表头: 第 {roster.header_row + 1} 行 (自动检测)")
+    else:
+        print(f"表头: 第 {roster.header_row + 1} 行 (未检测到 姓名/门店，使用默认位置)")
+    resolve_columns(roster, log=print)
+
+    # One pass over the sheet: non-empty counts plus the head of one column
+    counts = [0] * len(roster.columns)
+    head = []
+    for row in roster:
+        for i, value in enumerate(row):
+            if value is not None and value != "":
+                counts[i] += 1
+        if len(head) < args.rows:
+            head.append(row[args.column] if args.column < len(row) else None)
+
+    print("\n各列非空数量:")
+    for i, (col, count) in enumerate(zip(roster.columns, counts)):
+        print(f"  [{i}] {col}: {count}")
+    print(f"\n第 {args.column} 列 ({roster.column(args.column)}) 前 {args.rows} 行:")
+    for value in head:
+        print(f"  {value}")
+    return 0
+
+
+def cmd_clean(args):
+    import quality_rules
+    from clean_pipeline import clean_roster
+
+    rules = quality_rules.load_rules(args.rules) if args.rules else quality_rules.load_rules()
+    result = clean_roster(args.excel, rules=rules, chunk_rows=args.chunk_rows)
+    return 1 if result.blockers else 0
+
+
+def cmd_clean_legacy(args):
+    from roster_engine import LEGACY_COLUMNS, Roster, iter_legacy_records, write_records_xlsx
+
+    output = args.output or os.path.splitext(args.excel)[0] + "_清洗版.xlsx"
+    roster = Roster(args.excel, header=args.header)
+    preview = []
+
+    def records():
+        for record in iter_legacy_records(roster, args.name_col, args.store_col, args.content_col):
+            if len(preview) < 5:
+                preview.append(record)
+            yield record
+
+    count = write_records_xlsx(records(), output, columns=LEGACY_COLUMNS)
+    print(f"Successfully processed {count} rows. -> {output}")
+    for record in preview:
+        print(f"  {record['姓名']} | {record['门店']} | {record['匠龄']}")
+    return 0
+
+
+def cmd_verify(args):
+    import quality_rules
+    from roster_engine import read_frame
+
+    rules = quality_rules.load_rules(args.rules) if args.rules else quality_rules.load_rules()
+    df = read_frame(args.excel)
+    columns = [c for c in ["姓名", "门店", "匠龄", "匠人独白", "描述1"] if c in df]
+
+    if args.store and "门店" in df:
+        rows = df[df["门店"].fillna("").astype(str).str.contains(args.store, regex=False)]
+        print(f"门店包含「{args.store}」: {len(rows)} 行")
+        print(rows[columns].head(args.limit).to_string())
+        print()
+
+    results = quality_rules.evaluate(df, rules)
+    print(f"数据检查: {len(rules)} 条规则，{len(results)} 条未通过")
+    for result in results:
+        print(f"\n[{result.level}] {result.describe()}")
+        if result.rows:
+            shown = df.loc[[r - 1 for r in result.rows[:args.limit]], columns]
+            print(shown.to_string())
+
+    if "匠龄" in df:
+        print("\n匠龄取值:")
+        print(df["匠龄"].dropna().unique())
+
+    if quality_rules.blocking(results) or (args.strict and any(r.level == "warning" for r in results)):
+        return 1
+    return 0
+
+
+def cmd_render(args):
+    from output_layout import OutputLayout
+    from render_client import render_remote
+
+    layout = OutputLayout(args.shard_by, "zip" if args.package else None)
+    report = render_remote(args.agent, args.excel, args.template or ["technician"], args.output, layout=layout,
+                           token=args.token, batch_rows=args.batch_rows, fetch=args.fetch,
+                           keep_remote=args.keep_remote)
+    if report is None or report.get("error"):
+        return 1
+    summary = report["summary"]
+    print(f"远程渲染完成: 成功 {summary['ok']}，部分完成 {summary['partial']}，失败 {summary['failed']}，跳过 {summary['skipped']}")
+    return 1 if summary["failed"] else 0
+
+
+def cmd_history(args):
+    import run_history
+
+    if not os.path.exists(args.db):
+        print(f"还没有运行记录 ({args.db})。完成一次清洗或生成后会自动创建。")
+        return 0
+    conn = run_history.connect(args.db)
+    try:
+        runs = run_history.recent_runs(conn, args.days, args.kind)
+        slowest = run_history.slowest_rows(conn, args.days, args.limit, args.template)
+        versions = run_history.template_versions(conn, args.template)
+    finally:
+        conn.close()
+
+    period = f"最近 {args.days} 天" if args.days else "全部"
+    print(f"=== 运行记录 ({period}，{len(runs)} 次) ===")
+    print(f"{'开始时间':<19}  {'类型':<8} {'行数':>6} {'耗时':>8} {'行/分钟':>8}  {'状态':<9} {'失败':>4}  主机 / 主要阶段")
+    for run in runs[-args.limit * 3:]:
+        rate = f"{run['rows_per_minute']:.1f}" if run["rows_per_minute"] else "-"
+        top_stages = sorted(run["stages"].items(), key=lambda item: -item[1])[:3]
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in top_stages)
+        print(f"{run['started']:<19}  {run['kind']:<8} {run['rows']:>6} {run['seconds']:>7.1f}s {rate:>8}  "
+              f"{run['status']:<9} {run['failed']:>4}  {run['host']} / {stages}")
+
+    print(f"\n=== 最慢的 {len(slowest)} 行 ===")
+    for row in slowest:
+        longest = f"{row['longest_column']} {row['text_chars']} 字" if row["longest_column"] else "-"
+        print(f"{row['seconds']:>7.2f}s  {row['template']:<12} 第 {row['row']} 行 {row['name']} @ {row['store']}  "
+              f"最长文本: {longest}  ({row['started']}, {row['status']})")
+
+    print("\n=== 模板版本 (每行耗时中位数) ===")
+    regressions = 0
+    for v in versions:
+        change = f"{(v['change'] - 1) * 100:+.0f}%" if v["change"] else ""
+        flag = "  ⚠️ 变慢" if v["regression"] else ""
+        regressions += v["regression"]
+        print(f"{v['template']:<12} {v['version'] or '-':<12} {v['first_used']} 起  {v['runs']:>3} 次 {v['rows']:>6} 行  "
+              f"{v['median_seconds']:.2f}s/行 {change}{flag}")
+    if regressions:
+        print(f"\n{regressions} 个模板版本比上一版本慢 {(run_history.REGRESSION_RATIO - 1) * 100:.0f}% 以上。")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="workshop_cli", description="维修师智能设计工坊 命令行工具")
+    sub = parser.add_subparsers(dest="command")
+    sub.required = True
+
+    p = sub.add_parser("dry-run", help="预检清洗版 Excel，不调用 Photoshop")
+    p.add_argument("excel", help="步骤 1 生成的 _清洗版.xlsx")
+    p.add_argument("--template", action="append", help="模板配置名 (templates/<名称>.json) 或配置文件路径；可重复指定以一次生成多个版本")
+    p.add_argument("--psd", help="覆盖配置中的 PSD 路径 (读取其旁边的 .schema.json 缓存)")
+    p.add_argument("--output", default=DEFAULT_OUTPUT, help="PSD 输出目录 (用于检查覆盖)")
+    p.add_argument("--shard-by", choices=["none", "store", "region", "date"], default="none", help="输出子目录分组方式")
+    p.add_argument("--strict", action="store_true", help="有警告时也返回非零退出码")
+    p.add_argument("--rules", help="质量规则文件 (默认 rules/default.json)")
+    p.add_argument("--json", help="把预检结果写入 JSON 文件")
+    p.set_defaults(func=cmd_dry_run)
+
+    p = sub.add_parser("inspect", help="查看原始 Excel：表头位置、识别出的关键列、各列非空数量")
+    p.add_argument("excel", help="原始 Excel 文件")
+    p.add_argument("--header", type=int, help="表头所在行 (从 0 开始)；默认自动检测")
+    p.add_argument("--column", type=int, default=1, help="预览第几列 (从 0 开始，默认 1)")
+    p.add_argument("--rows", type=int, default=10, help="预览行数")
+    p.set_defaults(func=cmd_inspect)
+
+    p = sub.add_parser("clean", help="清洗原始 Excel (与 GUI 步骤 1 相同，分块处理，适合超大表格)")
+    p.add_argument("excel", help="原始 Excel 文件")
+    p.add_argument("--rules", help="质量规则文件 (默认 rules/default.json)")
+    p.add_argument("--chunk-rows", type=int, default=5000, help="每块处理的行数 (默认 5000)")
+    p.set_defaults(func=cmd_clean)
+
+    p = sub.add_parser("clean-legacy", help="旧版清洗规则 (按固定列位置，姓名/匠龄从文案中提取)")
+    p.add_argument("excel", help="原始 Excel 文件")
+    p.add_argument("-o", "--output", help="输出路径 (默认 <原文件名>_清洗版.xlsx)")
+    p.add_argument("--header", type=int, default=2, help="表头所在行 (从 0 开始，默认 2)")
+    p.add_argument("--name-col", type=int, default=1, help="姓名列 (从 0 开始，用于过滤空行)")
+    p.add_argument("--store-col", type=int, default=4, help="门店列 (从 0 开始)")
+    p.add_argument("--content-col", type=int, default=6, help="文案列 (从 0 开始)")
+    p.set_defaults(func=cmd_clean_legacy)
+
+    p = sub.add_parser("verify", help="检查清洗版 Excel 中的可疑数据")
+    p.add_argument("excel", help="清洗版 Excel 文件")
+    p.add_argument("--store", help="额外列出门店名包含该关键字的行，例如 盐城")
+    p.add_argument("--rules", help="质量规则文件 (默认 rules/default.json)")
+    p.add_argument("--limit", type=int, default=20, help="每项最多显示的行数")
+    p.add_argument("--strict", action="store_true", help="有 warning 级问题时也返回非零退出码 (error 级总是返回 1)")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("render", help="把清洗版 Excel 提交到远程渲染节点 (render_agent.py) 生成 PSD 并下载结果")
+    p.add_argument("excel", help="步骤 1 生成的 _清洗版.xlsx")
+    p.add_argument("--agent", required=True, help="渲染节点地址，例如 http://192.168.1.20:8765")
+    p.add_argument("--template", action="append", help="渲染节点上的模板名；可重复指定")
+    p.add_argument("--output", default=DEFAULT_OUTPUT, help="结果下载目录")
+    p.add_argument("--shard-by", choices=["none", "store", "region", "date"], default="none", help="输出子目录分组方式")
+    p.add_argument("--package", action="store_true", help="在渲染节点上按分组打包 zip，只下载压缩包")
+    p.add_argument("--token", default=os.environ.get("RENDER_AGENT_TOKEN"), help="渲染节点的访问令牌 (也可用环境变量 RENDER_AGENT_TOKEN)")
+    p.add_argument("--batch-rows", type=int, default=500, help="每次上传的行数 (默认 500)")
+    p.add_argument("--fetch", choices=["auto", "all", "packages", "none"], default="auto",
+                   help="下载哪些结果: auto=打包时只下载压缩包，否则全部")
+    p.add_argument("--keep-remote", action="store_true", help="下载后保留渲染节点上的任务文件")
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser("history", help="查看运行历史：吞吐量趋势、最慢的行、模板版本间的速度变化")
+    p.add_argument("--days", type=int, default=30, help="统计最近多少天 (0 = 全部，默认 30)")
+    p.add_argument("--kind", choices=["clean", "generate"], help="只看清洗或生成")
+    p.add_argument("--template", help="只看某个模板的行和版本")
+    p.add_argument("--limit", type=int, default=10, help="最慢的行显示几行 (默认 10)")
+    p.add_argument("--db", default=os.path.join(BASE_DIR, "run_history.sqlite3"), help="历史数据库路径")
+    p.set_defaults(func=cmd_history)
+    return parser
+
+
+def main(argv=None):
+    from quality_rules import QualityRuleError
+    from render_client import RemoteRenderError
+    from template_mapping import TemplateConfigError
+
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except TemplateConfigError as e:
+        print(f"模板配置错误: {e}", file=sys.stderr)
+        return 2
+    except QualityRuleError as e:
+        print(f"质量规则配置错误: {e}", file=sys.stderr)
+        return 2
+    except RemoteRenderError as e:
+        print(f"远程渲染错误: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())